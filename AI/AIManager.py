@@ -1,10 +1,22 @@
 from RandomMovesBot.RandomMovesBot import return_random_move
 from board import is_game_over
+from . import OpeningBook
 
 def main(gameboard, ai_player, opponent_player):
+    best_move = choose_move(gameboard, ai_player, opponent_player)
+    return play_move(gameboard, ai_player, opponent_player, best_move)
+
+def choose_move(gameboard, ai_player, opponent_player):
+    """Runs the player's AI on the position and returns its move (None if it has none)."""
     best_move = None
     ai_name = ai_player.ai_name
 
+    # Searching AIs built with use_book play their first moves straight from the opening book
+    if ai_name in ("MinimaxAI", "MCTS_AI") and getattr(ai_player.ai_class, "use_book", False):
+        best_move = OpeningBook.find_book_move(gameboard, ai_player)
+        if best_move is not None:
+            return best_move
+
     if ai_name == "MinimaxAI":
         if hasattr(ai_player, 'ai_class') and ai_player.ai_class:
             best_move = ai_player.ai_class.find_best_move(gameboard, ai_player, opponent_player)
@@ -32,7 +44,9 @@ def main(gameboard, ai_player, opponent_player):
     else:
         print(f"Warning: AI '{ai_name}' not recognized. Falling back to random moves.")
         best_move = return_random_move(gameboard, ai_player)
+    return best_move
 
+def play_move(gameboard, ai_player, opponent_player, best_move):
     if best_move is not None:
         # --- THIS IS THE BUG FIX ---
         # Pass a list [ai_player, opponent_player]
@@ -0,0 +1,216 @@
+import atexit, multiprocessing, time
+import numpy as np
+import board, player
+from . import AIManager
+
+# Seconds of pondering between two pauses, which also check for messages
+PONDER_SLICE = 0.1
+# AIs run in a worker: their objects can be sent to another process and
+# their searches can be interrupted (the should_stop hook)
+WORKER_AIS = ("MinimaxAI", "MCTS_AI")
+# Seconds stop() waits for the worker to shut its AI down before killing it
+STOP_TIMEOUT = 2.0
+
+def load_position(position, players):
+    """
+    Rebuilds the board for a position in the save-game format
+    (GameSession.get_state_to_save) and loads it into players, which are
+    kept between turns so tree reuse still finds them.
+    """
+    gameboard = board.Board(position["rows"], position["cols"], player_count=len(players))
+    gameboard.board = np.array(position["board"])
+    gameboard.turn_number = position["turn_number"]
+    for p, p_state in zip(players, position["players"]):
+        p.load_state(p_state)
+    gameboard.side_to_move = players[position["active_player_idx"]].number
+    gameboard.recompute_zobrist(players)
+    gameboard.update_board_corners(players)
+    return gameboard
+
+def make_stop_check(connection, cpu_share):
+    """
+    The should_stop callback for an AI's ponder_search: True once a message
+    from the game is waiting, and from then on. After every PONDER_SLICE
+    seconds of work it idles long enough to keep the process to cpu_share
+    of one core.
+    """
+    share = min(max(cpu_share, 0.01), 1.0)
+    state = {"slice_start": time.perf_counter(), "stopped": False}
+    def should_stop():
+        if state["stopped"]:
+            return True
+        elapsed = time.perf_counter() - state["slice_start"]
+        if elapsed < PONDER_SLICE:
+            return False
+        if connection.poll(elapsed * (1.0 - share) / share):
+            state["stopped"] = True
+            return True
+        state["slice_start"] = time.perf_counter()
+        return False
+    return should_stop
+
+def _worker_main(connection, player_number, ai_name, ai_class):
+    """
+    Worker process loop. ("search", request id, position) messages are
+    answered with (request id, move). ("ponder", None, position) makes the
+    AI search a position where its opponent is to move. Both are cut short
+    by the next message; ("idle", None, None) just does that. None ends the
+    loop, and the AI's own worker pool is shut down on the way out.
+    """
+    try:
+        _serve(connection, player_number, ai_name, ai_class)
+    finally:
+        ai_class.close()
+
+def _serve(connection, player_number, ai_name, ai_class):
+    players = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        kind, request_id, position = message
+        if kind == "idle":
+            continue
+        if players is None or len(players) != len(position["players"]):
+            players = [player.Player(i + 1, None, i + 1 == player_number,
+                                     ai_name if i + 1 == player_number else None,
+                                     ai_class if i + 1 == player_number else None)
+                       for i in range(len(position["players"]))]
+        gameboard = load_position(position, players)
+        active_idx = position["active_player_idx"]
+        if kind == "ponder":
+            # Returns when a message is waiting or there is nothing left to search
+            ai_class.ponder_search(gameboard, players[player_number - 1], players[active_idx],
+                                   make_stop_check(connection, ai_class.ponder_cpu_share))
+            continue
+        ai_player = players[active_idx]
+        opponent = players[(active_idx + 1) % len(players)]
+        # A cancelled search stops early; the game drops its answer
+        ai_class.should_stop = make_stop_check(connection, 1.0)
+        try:
+            best_move = AIManager.choose_move(gameboard, ai_player, opponent)
+        finally:
+            ai_class.should_stop = None
+        connection.send((request_id, best_move))
+
+class AIWorker:
+    """
+    Runs one AI player's searches in a background process so the game loop
+    keeps drawing and handling events while it thinks. The AI object lives
+    in the worker for the whole game, so its transposition tables and
+    search trees carry over from turn to turn, including what it found by
+    pondering while the opponent was to move. Only the AIs in WORKER_AIS
+    are run this way (see is_supported).
+    """
+    def __init__(self, ai_player):
+        self.number = ai_player.number
+        self.ai_name = ai_player.ai_name
+        self.ai_class = ai_player.ai_class
+        self.process = None
+        self.connection = None
+        self.request_id = 0
+        self.pending = None # Id of the request being searched
+        self.ponder_key = None # Key of the position being pondered, if any
+        self.exit_hook_registered = False
+
+    @staticmethod
+    def is_supported(ai_player):
+        return ai_player.ai_name in WORKER_AIS and ai_player.ai_class is not None
+
+    def start(self):
+        parent_connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main,
+                                               args=(child_connection, self.number, self.ai_name, self.ai_class))
+        self.process.start()
+        child_connection.close()
+        self.connection = parent_connection
+        if not self.exit_hook_registered:
+            # Runs before multiprocessing waits for its children at exit
+            atexit.register(self.stop)
+            self.exit_hook_registered = True
+
+    def is_thinking(self):
+        return self.pending is not None
+
+    def can_ponder(self):
+        return getattr(self.ai_class, "ponder", False)
+
+    def request_move(self, position):
+        """Starts a search on position, a dict in the save-game format."""
+        if self.process is None or not self.process.is_alive():
+            self.start()
+        self.request_id += 1
+        self.pending = self.request_id
+        self.ponder_key = None
+        self.connection.send(("search", self.request_id, position))
+
+    def ponder(self, position, key):
+        """
+        Lets the AI search position, where its opponent is to move, until the
+        next request. key identifies the position, so calling this every
+        frame only sends it once.
+        """
+        if self.pending is not None or key == self.ponder_key:
+            return
+        if self.process is None or not self.process.is_alive():
+            self.start()
+        self.ponder_key = key
+        self.connection.send(("ponder", None, position))
+
+    def stop_pondering(self):
+        if self.ponder_key is not None and self.process is not None:
+            self.connection.send(("idle", None, None))
+        self.ponder_key = None
+
+    def poll(self):
+        """Returns (True, move) once the search has finished, otherwise (False, None)."""
+        if self.pending is None:
+            return False, None
+        if not self.connection.poll():
+            if not self.process.is_alive():
+                self.pending = None
+                raise RuntimeError("AI worker for player %d stopped unexpectedly" % self.number)
+            return False, None
+        request_id, best_move = self.connection.recv()
+        if request_id != self.pending:
+            return False, None # Answer to a search that was cancelled
+        self.pending = None
+        return True, best_move
+
+    def cancel(self):
+        """
+        Abandons the search in flight, or stops pondering. The worker notices
+        the message and goes back to waiting, keeping its tables; the answer
+        of the abandoned search is ignored by poll.
+        """
+        if self.pending is not None:
+            self.connection.send(("idle", None, None))
+            self.pending = None
+            self.ponder_key = None
+        else:
+            self.stop_pondering()
+
+    def stop(self):
+        """
+        Ends the worker process. It is asked to exit first so that its AI
+        shuts down its own worker pool; it is only killed if that takes
+        longer than STOP_TIMEOUT.
+        """
+        if self.process is not None:
+            if self.process.is_alive():
+                try:
+                    self.connection.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+                self.process.join(STOP_TIMEOUT)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.connection.close()
+        self.process = None
+        self.connection = None
+        self.pending = None
+        self.ponder_key = None
\ No newline at end of file
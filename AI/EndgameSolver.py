@@ -0,0 +1,158 @@
+import time
+import board, pieces, constants
+from .TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Share of the board that must be covered before the moves are counted at
+# all. Even random games only get down to a dozen moves past about 40%.
+MIN_BOARD_FILL = 0.3
+
+class SolverTimeout(Exception):
+    """Raised inside the solver when its time budget runs out."""
+    pass
+
+class EndgameSolver:
+    """
+    Exact alpha-beta (negamax) search to the end of the game, scored by the
+    final board.scoring_fn difference, bonuses included. A player without a
+    move passes and the game ends when neither can move. Moves are played
+    on the game's own board with apply_move / undo_move, and the table is
+    kept between turns so the next solve along the same line is mostly hits.
+    """
+    def __init__(self, move_threshold=12, time_limit=1.0, time_share=0.5, tt_size_mb=16):
+        # Solve once both players together have at most this many legal moves
+        self.move_threshold = move_threshold
+        # Budget per solve: time_share of the searcher's own time limit, or
+        # time_limit seconds for searchers without one
+        self.time_limit = time_limit
+        self.time_share = time_share
+        self.tt = TranspositionTable(tt_size_mb)
+        self.deadline = None
+        self.nodes = 0
+        # Move count of the last solve that ran out of time. The move count
+        # is only a rough guide to the size of the game tree, so positions
+        # are not tried again until it drops below this.
+        self.failed_move_count = None
+
+    def try_solve(self, gameboard, player, opponent, search_time_limit=None):
+        """
+        Returns the move that maximizes player's final score margin, or None
+        when the position is not small enough yet or the solve ran out of
+        time. search_time_limit is the caller's time per move, if it has one.
+        """
+        if bin(gameboard.occupied).count("1") < MIN_BOARD_FILL * gameboard.rows * gameboard.cols:
+            self.failed_move_count = None # Far from the endgame, e.g. a new game
+            return None
+        possible_moves = board.return_all_pending_moves(gameboard, player)
+        if not possible_moves:
+            return None
+        move_count = len(possible_moves)
+        if move_count <= self.move_threshold:
+            move_count += len(board.return_all_pending_moves(gameboard, opponent))
+        if move_count > self.move_threshold:
+            self.failed_move_count = None # Not in the endgame (again)
+            return None
+        if self.failed_move_count is not None and move_count >= self.failed_move_count:
+            return None
+
+        start = time.perf_counter()
+        if search_time_limit is None:
+            self.deadline = start + self.time_limit
+        else:
+            self.deadline = start + search_time_limit * self.time_share
+        self.nodes = 0
+        try:
+            value, best_move = self.solve_root(gameboard, player, opponent, possible_moves)
+        except SolverTimeout:
+            self.failed_move_count = move_count
+            if constants.VERBOSITY > 0:
+                print("Endgame solver gave up after %d nodes" % self.nodes)
+            return None
+        finally:
+            self.deadline = None
+        if constants.VERBOSITY > 0:
+            print("Endgame solved: margin %d, %d nodes in %.2fs" % (value, self.nodes, time.perf_counter() - start))
+        return best_move
+
+    def solve_root(self, gameboard, player, opponent, possible_moves):
+        players_list = [player, opponent]
+        self.order_moves(gameboard, player, possible_moves)
+        alpha, beta = constants.M_INFINITY, constants.INFINITY
+        best_move = None
+        for move in possible_moves:
+            gameboard.apply_move(move, player, players_list)
+            try:
+                value = -self.negamax(gameboard, opponent, player, -beta, -alpha)
+            finally:
+                gameboard.undo_move()
+            if value > alpha:
+                alpha = value
+                best_move = move
+        return alpha, best_move
+
+    def get_key(self, gameboard, mover):
+        # A pass changes who moves without touching the board, so the side
+        # in the hash is replaced by the player actually to move
+        return gameboard.zobrist ^ board.ZOBRIST_SIDE[gameboard.side_to_move] ^ board.ZOBRIST_SIDE[mover.number]
+
+    def negamax(self, gameboard, mover, other, alpha, beta):
+        if time.perf_counter() > self.deadline:
+            raise SolverTimeout()
+        self.nodes += 1
+
+        key = self.get_key(gameboard, mover)
+        alpha_orig = alpha
+        tt_move_key = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, _, tt_flag, tt_score, tt_move_key = entry
+            if tt_flag == EXACT:
+                return tt_score
+            elif tt_flag == LOWER_BOUND:
+                alpha = max(alpha, tt_score)
+            elif tt_flag == UPPER_BOUND:
+                beta = min(beta, tt_score)
+            if beta <= alpha:
+                return tt_score
+
+        possible_moves = board.return_all_pending_moves(gameboard, mover)
+        if not possible_moves:
+            if board.check_if_player_can_move(gameboard, other):
+                return -self.negamax(gameboard, other, mover, -beta, -alpha)
+            value = board.scoring_fn(mover.remaining_pieces) - board.scoring_fn(other.remaining_pieces)
+            self.tt.store(key, 0, EXACT, value, None)
+            return value
+
+        self.order_moves(gameboard, mover, possible_moves, tt_move_key)
+        players_list = [mover, other]
+        best_value = constants.M_INFINITY
+        best_move = None
+        for move in possible_moves:
+            gameboard.apply_move(move, mover, players_list)
+            try:
+                value = -self.negamax(gameboard, other, mover, -beta, -alpha)
+            finally:
+                gameboard.undo_move()
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER_BOUND
+        elif best_value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, 0, flag, best_value, board.get_move_key(best_move))
+        return best_value
+
+    def order_moves(self, gameboard, mover, possible_moves, tt_move_key=None):
+        # The table's move first, then the biggest pieces: they take the most
+        # points off the final count
+        def priority(move):
+            if tt_move_key is not None and board.get_move_key(move) == tt_move_key:
+                return constants.INFINITY
+            return pieces.get_piece_size(move["piece"])
+        possible_moves.sort(key=priority, reverse=True)
\ No newline at end of file
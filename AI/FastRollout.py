@@ -0,0 +1,111 @@
+import random
+import board, pieces
+
+# Random placements tried before falling back to a scan for any legal move
+SAMPLE_ATTEMPTS = 64
+
+class RolloutState:
+    """
+    Throwaway copy of a position for random playouts: the players' bitboards
+    and remaining pieces, updated in place with no undo and no Player
+    objects. The Board it was built from is only used for its geometry.
+    """
+    __slots__ = ("gameboard", "occupied", "occupancy", "forbidden", "anchors", "remaining", "orientations", "moves")
+
+    def __init__(self, gameboard, players_list):
+        self.gameboard = gameboard
+        self.occupied = gameboard.occupied
+        self.occupancy = {}
+        self.forbidden = {}
+        self.anchors = {}
+        self.remaining = {}
+        self.orientations = {}
+        self.moves = [] # (player number, board.get_move_code) of every move played
+        for player in players_list:
+            p_num = player.number
+            self.occupancy[p_num] = gameboard.occupancy[p_num]
+            self.forbidden[p_num] = gameboard.forbidden[p_num]
+            self.anchors[p_num] = gameboard.anchors[p_num]
+            self.remaining[p_num] = list(player.remaining_pieces)
+            self.orientations[p_num] = [orientation_id for piece_name in player.remaining_pieces
+                                        for orientation_id in pieces.PIECE_ORIENTATIONS[piece_name]]
+
+    def sample_move(self, p_num, attempts=SAMPLE_ATTEMPTS):
+        """
+        Rejection sampling over (anchor cell, orientation, piece cell): lines a
+        random cell of a random remaining orientation up with a random open
+        anchor and keeps the first placement that fits. Returns
+        (orientation id, mask), or None if the player has no move left.
+        Only when every attempt fails is there a scan for any fitting move,
+        and a player it finds nothing for is out for the rest of the playout.
+        """
+        orientations = self.orientations[p_num]
+        blocked = self.occupied | self.forbidden[p_num]
+        open_anchors = self.anchors[p_num] & ~blocked
+        if not orientations or not open_anchors:
+            self.orientations[p_num] = []
+            return None
+        anchor_cells = list(board.iter_bits(open_anchors))
+        gameboard = self.gameboard
+        cols = gameboard.cols
+        for _ in range(attempts):
+            anchor_x, anchor_y = divmod(random.choice(anchor_cells), cols)
+            orientation_id = random.choice(orientations)
+            i, j = random.choice(pieces.ORIENTATIONS[orientation_id].cells)
+            mask = gameboard.get_orientation_mask(orientation_id, (anchor_x - i, anchor_y - j))
+            if mask is not None and not mask & blocked:
+                return orientation_id, mask
+
+        orientations = random.sample(orientations, len(orientations))
+        for orientation_id in orientations:
+            cells = pieces.ORIENTATIONS[orientation_id].cells
+            for anchor in anchor_cells:
+                anchor_x, anchor_y = divmod(anchor, cols)
+                for i, j in cells:
+                    mask = gameboard.get_orientation_mask(orientation_id, (anchor_x - i, anchor_y - j))
+                    if mask is not None and not mask & blocked:
+                        return orientation_id, mask
+        # Pieces only ever get more blocked, so this player is done
+        self.orientations[p_num] = []
+        return None
+
+    def play(self, p_num, orientation_id, mask):
+        gameboard = self.gameboard
+        self.occupancy[p_num] |= mask
+        self.occupied |= mask
+        # Neighbours of the new piece are enough: the masks only ever grow,
+        # and sample_move filters anchors that got covered since
+        self.forbidden[p_num] |= gameboard.edge_neighbours(mask)
+        self.anchors[p_num] |= gameboard.diagonal_neighbours(mask)
+        # The mask's lowest bit is the orientation's first cell, moved by x * cols + y
+        orientation_mask = gameboard.orientation_masks[orientation_id]
+        shift = (mask & -mask).bit_length() - (orientation_mask & -orientation_mask).bit_length()
+        self.moves.append((p_num, orientation_id * gameboard.rows * gameboard.cols + shift))
+        piece_name = pieces.ORIENTATIONS[orientation_id].piece
+        self.remaining[p_num].remove(piece_name)
+        self.orientations[p_num] = [o for o in self.orientations[p_num] if pieces.ORIENTATIONS[o].piece != piece_name]
+
+    def score(self, p_num):
+        return board.scoring_fn(self.remaining[p_num])
+
+def random_playout(gameboard, player, opponent, max_moves=40, attempts=SAMPLE_ATTEMPTS):
+    """
+    Plays random moves from the position on gameboard, player first, for up
+    to max_moves turns and returns the final RolloutState. gameboard itself
+    is not changed. A player with no move passes; two passes in a row end
+    the game.
+    """
+    state = RolloutState(gameboard, [player, opponent])
+    turn, waiting = player.number, opponent.number
+    passes = 0
+    for _ in range(max_moves):
+        sampled = state.sample_move(turn, attempts)
+        if sampled is None:
+            passes += 1
+            if passes == 2:
+                break
+        else:
+            passes = 0
+            state.play(turn, *sampled)
+        turn, waiting = waiting, turn
+    return state
\ No newline at end of file
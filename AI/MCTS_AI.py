@@ -1,85 +1,148 @@
 import random
 import math
-import copy
 import board
 import pieces
+import constants
 import time
+import numpy as np
+from .FastRollout import random_playout
+from .Searcher import Searcher
+
+# Root visits at which pondering stops when max_iterations is not set. Each
+# iteration adds a node, so this bounds how far the tree grows while the
+# opponent thinks.
+PONDER_MAX_VISITS = 20000
 
 class MCTSNode:
-    def __init__(self, game_state, player, opponent, parent=None, move=None):
-        self.game_state = game_state # The Board object
+    # Trees run to hundreds of thousands of nodes, so nodes keep slots only
+    # and moves are stored as board.get_move_code ints
+    __slots__ = ("player", "opponent", "parent", "move_code", "children", "wins", "visits",
+                 "index", "child_wins", "child_visits", "child_index", "child_amaf_wins", "child_amaf_visits",
+                 "position_hash", "untried_moves", "pending_pieces")
+
+    def __init__(self, gameboard, player, opponent, parent=None, move_code=None):
+        # Nodes do not keep their own copy of the game. The search plays the
+        # moves along the path from the root onto a single board with
+        # apply_move, so gameboard must be at this node's position here.
         self.player = player         # The player whose *turn it is* at this node
         self.opponent = opponent     # The other player
         self.parent = parent
-        self.move = move             # The move that led to this state
+        self.move_code = move_code   # The move that led to this state
         self.children = []
         self.wins = 0
         self.visits = 0
+        self.index = None            # Position in parent.children
+        self.child_wins = None       # Children's wins and visits, see add_child
+        self.child_visits = None
+        # All-moves-as-first statistics of the children, only kept with RAVE (see update_amaf)
+        self.child_index = None
+        self.child_amaf_wins = None
+        self.child_amaf_visits = None
+        # Hash of the position at this node, used to find it again on a later turn
+        self.position_hash = gameboard.zobrist
+        # Moves are generated lazily, one piece at a time, once the node is
+        # first expanded (see has_untried_moves)
+        self.untried_moves = []
+        self.pending_pieces = None
+
+    @property
+    def players_list(self):
         # A list of players for game_over/fit_piece checks
-        self.players_list = [player, opponent] 
-        self.untried_moves = self.get_all_moves()
+        return [self.player, self.opponent]
 
-    def get_all_moves(self):
-        # Get all possible moves for the current player
-        return board.return_all_pending_moves(self.game_state, self.player)
+    def get_move(self, gameboard):
+        """The move that led to this node, as a move dict."""
+        return board.move_from_code(gameboard, self.move_code)
 
-    def uct_select_child(self, exploration_constant=1.414):
-        # Select child with highest UCT value (Upper Confidence Bound for Trees)
-        best_child = None
-        best_score = -float('inf')
-        
-        for child in self.children:
-            if child.visits == 0:
-                # Prioritize unvisited nodes
-                score = float('inf')
-            else:
-                exploit_term = child.wins / child.visits
-                explore_term = exploration_constant * math.sqrt(math.log(self.visits) / child.visits)
-                score = exploit_term + explore_term
-            
-            if score > best_score:
-                best_score = score
-                best_child = child
-        return best_child
+    def has_untried_moves(self, gameboard):
+        """
+        True while the node has moves left to expand. gameboard must be at
+        this node's position: when the current piece's moves run out, the
+        next piece's are generated from it. Pieces go largest first, so a
+        node visited only a few times never enumerates the small ones.
+        Within a piece the moves that open the most new corners are expanded
+        first, which makes expansion order the prior (piece size, corners
+        gained) that progressive widening relies on.
+        """
+        while not self.untried_moves:
+            if self.pending_pieces is None:
+                self.pending_pieces = sorted(self.player.remaining_pieces, key=pieces.get_piece_size)
+            if not self.pending_pieces:
+                return False
+            batch = board.return_piece_moves(gameboard, self.player, self.pending_pieces.pop())
+            # Sorted ascending because expand pops from the end
+            batch.sort(key=lambda move: gameboard.corners_gained(move["orientation"], move["place_on_board_at"], self.player))
+            self.untried_moves = [board.get_move_code(gameboard, move) for move in batch]
+        return True
 
-    def expand(self):
+    def uct_select_child(self, exploration_constant=1.414, rave_equivalence=None):
+        # Select child with highest UCT value (Upper Confidence Bound for Trees),
+        # scored for all children at once from the arrays kept by add_child
+        child_count = len(self.children)
+        visits = self.child_visits[:child_count]
+        wins = self.child_wins[:child_count]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = wins / visits
+            if rave_equivalence is not None and self.child_amaf_visits is not None:
+                # RAVE: blend in the AMAF value, trusting it less as real visits
+                # grow; rave_equivalence is the visit count where both weigh the same
+                amaf_visits = self.child_amaf_visits[:child_count]
+                amaf_values = np.where(amaf_visits > 0, self.child_amaf_wins[:child_count] / amaf_visits, values)
+                beta = np.sqrt(rave_equivalence / (3 * visits + rave_equivalence))
+                values = (1 - beta) * values + beta * amaf_values
+            scores = values + exploration_constant * np.sqrt(math.log(self.visits) / visits)
+        # Prioritize unvisited nodes
+        scores[visits == 0] = np.inf
+        return self.children[int(np.argmax(scores))]
+
+    def add_child(self, child_node):
+        # Children's wins/visits are mirrored into arrays here so selection
+        # can score them together; they grow by doubling
+        if self.child_visits is None:
+            self.child_wins = np.zeros(8)
+            self.child_visits = np.zeros(8)
+        elif len(self.children) == len(self.child_visits):
+            self.child_wins = np.concatenate((self.child_wins, np.zeros(len(self.child_wins))))
+            self.child_visits = np.concatenate((self.child_visits, np.zeros(len(self.child_visits))))
+            if self.child_amaf_visits is not None:
+                self.child_amaf_wins = np.concatenate((self.child_amaf_wins, np.zeros(len(self.child_amaf_wins))))
+                self.child_amaf_visits = np.concatenate((self.child_amaf_visits, np.zeros(len(self.child_amaf_visits))))
+        child_node.index = len(self.children)
+        if self.child_index is not None:
+            self.child_index[child_node.move_code] = child_node.index
+        self.children.append(child_node)
+
+    def expand(self, gameboard):
         # Expand one untried move
         if not self.untried_moves:
             return None # Fully expanded
             
-        move = self.untried_moves.pop()
+        move_code = self.untried_moves.pop()
         
-        # Create a new state by applying the move
-        new_board = copy.deepcopy(self.game_state)
-        new_player = copy.deepcopy(self.player)
-        new_opponent = copy.deepcopy(self.opponent)
-        
-        # Apply the move
-        new_board.fit_piece(move, new_player, [new_player, new_opponent])
+        # Apply the move; the caller undoes it once the iteration is over
+        gameboard.apply_move(board.move_from_code(gameboard, move_code), self.player, self.players_list)
         
         # Create the child node.
         # The "player" for the child is the *opponent* because it's their turn next.
-        child_node = MCTSNode(new_board, new_opponent, new_player, parent=self, move=move)
-        self.children.append(child_node)
+        child_node = MCTSNode(gameboard, self.opponent, self.player, parent=self, move_code=move_code)
+        self.add_child(child_node)
         return child_node
 
-    def simulate(self):
-        # Simulate a random playout ("rollout") from this node's state
-        current_board = copy.deepcopy(self.game_state)
-        sim_player = copy.deepcopy(self.player) 
-        sim_opponent = copy.deepcopy(self.opponent) 
-        
-        current_turn_player = sim_player
-        other_player = sim_opponent
-        players_list = [current_turn_player, other_player]
+    def simulate(self, gameboard, played=None):
+        # Simulate a random playout ("rollout") from this node's state.
+        # If played is a list, (player number, move code) of every move is added to it.
+        current_turn_player = self.player
+        other_player = self.opponent
+        players_list = self.players_list
+        moves_played = 0
 
         # Limit simulation depth to avoid long rollouts
         for _ in range(40): # Max 40 moves (20 per player)
             
-            if board.is_game_over(current_board, players_list):
+            if board.is_game_over(gameboard, players_list):
                 break
 
-            possible_moves = board.return_all_pending_moves(current_board, current_turn_player)
+            possible_moves = board.return_all_pending_moves(gameboard, current_turn_player)
             
             if not possible_moves:
                 # Player has no moves, skip turn
@@ -88,15 +151,38 @@ class MCTSNode:
 
             # Play a random move
             move = random.choice(possible_moves)
-            current_board.fit_piece(move, current_turn_player, players_list)
+            gameboard.apply_move(move, current_turn_player, players_list)
+            moves_played += 1
+            if played is not None:
+                played.append((current_turn_player.number, board.get_move_code(gameboard, move)))
             
             # Swap turns
             current_turn_player, other_player = other_player, current_turn_player
 
         # Game is over or depth limit reached, determine winner
         # We must evaluate from the perspective of the player who *made the move to get here*
-        # which is self.parent.player
-        return self.get_simulation_result(current_board, self.parent.player, self.player)
+        # which is self.opponent
+        result = self.get_simulation_result(gameboard, self.opponent, self.player)
+
+        # Take the rollout back so the board is at this node's position again
+        for _ in range(moves_played):
+            gameboard.undo_move()
+        return result
+
+    def fast_simulate(self, gameboard, played=None):
+        # Same playout as simulate on a light copy of the position, with moves
+        # picked by rejection sampling instead of full enumeration
+        state = random_playout(gameboard, self.player, self.opponent)
+        if played is not None:
+            played.extend(state.moves)
+        # From the perspective of the player who moved into this node
+        mover_score = state.score(self.opponent.number)
+        other_score = state.score(self.player.number)
+        if mover_score > other_score:
+            return 1.0 # Win
+        elif mover_score < other_score:
+            return 0.0 # Loss
+        return 0.5 # Draw
 
     def get_simulation_result(self, final_board, original_player, opponent_player):
         # Check the score from the perspective of the *original* player
@@ -120,45 +206,260 @@ class MCTSNode:
             # We add the result to the parent's wins.
             # The child's "win" is (1 - parent_win).
             current_node.wins += current_result
+            parent = current_node.parent
+            if parent is not None:
+                parent.child_visits[current_node.index] += 1
+                parent.child_wins[current_node.index] += current_result
             current_result = 1.0 - current_result # Invert result for parent
-            current_node = current_node.parent
+            current_node = parent
+
+    def update_amaf(self, result, played):
+        """
+        All-moves-as-first update after a simulation from this node, with
+        result as passed to backpropagate and played the rollout's moves.
+        Every node on the path to the root credits each of its children whose
+        move its player went on to make later in the iteration, in the tree
+        or in the rollout, as if it had been played first.
+        """
+        later_moves = {self.player.number: set(), self.opponent.number: set()}
+        for p_num, move_code in played:
+            later_moves[p_num].add(move_code)
+        current_node = self
+        current_result = result # From the perspective of current_node.opponent
+        while current_node is not None:
+            if current_node.children:
+                if current_node.child_index is None:
+                    current_node.child_index = {child.move_code: child.index for child in current_node.children}
+                    current_node.child_amaf_wins = np.zeros(len(current_node.child_visits))
+                    current_node.child_amaf_visits = np.zeros(len(current_node.child_visits))
+                child_index = current_node.child_index
+                for move_code in later_moves[current_node.player.number]:
+                    index = child_index.get(move_code)
+                    if index is not None:
+                        current_node.child_amaf_visits[index] += 1
+                        current_node.child_amaf_wins[index] += 1.0 - current_result
+            parent = current_node.parent
+            if parent is not None:
+                later_moves[parent.player.number].add(current_node.move_code)
+            current_result = 1.0 - current_result
+            current_node = parent
+
+# Per-process state of the root-parallel search workers, set by _init_worker
+_worker = {}
+
+def _init_worker(shared_stop):
+    _worker["shared_stop"] = shared_stop
+
+def _search_in_worker(gameboard, player, opponent, settings, seed):
+    """
+    Runs in a worker process: grows an independent tree from the position on
+    the worker's copy of the board and returns the root children's visit
+    counts keyed by move code, with the number of iterations run. The search
+    ends early, with what it has, once the pool's stop flag is set.
+    """
+    random.seed(seed)
+    searcher = MCTS(None, player.number, reuse_tree=False, endgame_threshold=None, **settings)
+    shared_stop = _worker["shared_stop"]
+    searcher.should_stop = lambda: bool(shared_stop.value)
+    root = MCTSNode(gameboard, player, opponent)
+    done = searcher.search(root, gameboard)
+    return {child.move_code: child.visits for child in root.children}, done
+
+class MCTS(Searcher):
+    process_local = Searcher.process_local + ("root",)
 
-class MCTS:
-    def __init__(self, player_color, player_number, iterations=100):
+    def __init__(self, player_color, player_number, iterations=100, time_limit=None, max_iterations=None, reuse_tree=True, workers=None,
+                 exploration_constant=1.414, fast_rollouts=True, rave=False, rave_equivalence=300,
+                 widening_constant=2.0, widening_exponent=0.5, endgame_threshold=12, ponder=False, ponder_cpu_share=0.5,
+                 use_book=False):
         self.color = player_color
         self.number = player_number
-        self.iterations = iterations # Number of simulations
+        self.iterations = iterations # Number of simulations when there is no time limit
+        # Per-move budget in seconds. When set the search runs until the
+        # deadline, or until max_iterations simulations if that comes first.
+        self.time_limit = time_limit
+        self.max_iterations = max_iterations
+        self.last_iterations = 0
+        # The tree of the last search is kept so the next one can start from
+        # the node of the position it is asked about (see get_root)
+        self.reuse_tree = reuse_tree
+        self.root = None
+        # Number of processes for root parallelism (None or 1 searches in this
+        # process). Each worker grows its own tree with the full budget and the
+        # root visit counts are summed.
+        self.workers = workers
+        self.exploration_constant = exploration_constant # UCT exploration weight
+        # Play rollouts with FastRollout instead of full move generation
+        self.fast_rollouts = fast_rollouts
+        # Blend all-moves-as-first values into UCT (see MCTSNode.update_amaf).
+        # rave_equivalence is the visit count at which both weigh the same.
+        self.rave = rave
+        self.rave_equivalence = rave_equivalence
+        # Progressive widening: a node visited n times may have at most
+        # widening_constant * n ** widening_exponent children, taken in prior
+        # order (see MCTSNode.has_untried_moves). None expands every move.
+        self.widening_constant = widening_constant
+        self.widening_exponent = widening_exponent
+        self.init_searcher(endgame_threshold, ponder, ponder_cpu_share, use_book)
 
     def find_best_move(self, gameboard, player, opponent):
-        # Create root node (it's the AI's turn)
-        root = MCTSNode(gameboard, player, opponent)
+        move_start = time.perf_counter()
+        if self.endgame is not None:
+            best_move = self.endgame.try_solve(gameboard, player, opponent, self.time_limit)
+            if best_move is not None:
+                return best_move
+        start = time.perf_counter()
+        # A failed endgame solve has used part of this move's budget
+        time_limit = None if self.time_limit is None else max(0.0, self.time_limit - (start - move_start))
+        if self.workers is None or self.workers <= 1:
+            # Root node (it's the AI's turn), from the previous tree if possible
+            root = self.get_root(gameboard, player, opponent)
+            iterations = self.search(root, gameboard, time_limit)
+            self.root = root if self.reuse_tree else None
+            # Choose the move that led to the most visited child
+            if not root.children:
+                best_move = None # No possible moves
+            else:
+                best_move = max(root.children, key=lambda c: c.visits).get_move(gameboard)
+        else:
+            best_move, iterations = self.parallel_search(gameboard, player, opponent, time_limit)
+
+        self.last_iterations = iterations
+        if constants.VERBOSITY > 0:
+            elapsed = time.perf_counter() - start
+            print("MCTS ran %d iterations in %.2fs (%.1f/s)" % (iterations, elapsed, iterations / elapsed if elapsed > 0 else 0.0))
+        return best_move
+
+    def search(self, root, gameboard, time_limit=None):
+        """
+        Runs simulations from root for the configured budget and returns how
+        many ran. time_limit replaces self.time_limit when both are set.
+        """
+        if self.time_limit is None:
+            for iterations in range(self.iterations):
+                if iterations > 0 and self.should_stop is not None and self.should_stop():
+                    return iterations
+                self.run_iteration(root, gameboard)
+            return self.iterations
+
+        deadline = time.perf_counter() + (self.time_limit if time_limit is None else time_limit)
+        iterations = 0
+        # Always finish one simulation so there is a move to return
+        while iterations == 0 or time.perf_counter() < deadline:
+            if self.max_iterations is not None and iterations >= self.max_iterations:
+                break
+            if iterations > 0 and self.should_stop is not None and self.should_stop():
+                break
+            self.run_iteration(root, gameboard)
+            iterations += 1
+        return iterations
+
+    def ponder_search(self, gameboard, player, opponent, should_stop):
+        """
+        Runs simulations while opponent is to move in gameboard, until
+        should_stop() returns True or the root has max_iterations visits
+        (PONDER_MAX_VISITS if that is not set).
+        The tree is rooted at the opponent's position and kept, so the next
+        find_best_move starts from the child of whatever reply is played.
+        Does nothing when the tree is not kept between searches.
+        """
+        if not self.reuse_tree or (self.workers is not None and self.workers > 1):
+            return
+        root = self.get_root(gameboard, opponent, player)
+        self.root = root
+        max_visits = PONDER_MAX_VISITS if self.max_iterations is None else self.max_iterations
+        while not should_stop():
+            if root.visits >= max_visits:
+                break
+            self.run_iteration(root, gameboard)
+
+    def parallel_search(self, gameboard, player, opponent, time_limit=None):
+        """
+        Root parallelism: every worker searches the position with its own tree
+        and random seed, and the move with the most visits over all trees is
+        returned with the total iteration count. Visit ties go to the move
+        generated first. When should_stop fires the workers are told to stop
+        and the move is chosen from what they searched so far.
+        """
+        possible_moves = board.return_all_pending_moves(gameboard, player)
+        if not possible_moves:
+            return None, 0
+        self.start_pool(self.workers, _init_worker)
+        # Workers search with the same settings, one process each
+        settings = {"iterations": self.iterations, "time_limit": self.time_limit if time_limit is None else time_limit,
+                    "max_iterations": self.max_iterations,
+                    "exploration_constant": self.exploration_constant, "fast_rollouts": self.fast_rollouts,
+                    "rave": self.rave, "rave_equivalence": self.rave_equivalence,
+                    "widening_constant": self.widening_constant, "widening_exponent": self.widening_exponent}
+        pending = [self.pool.apply_async(_search_in_worker, (gameboard, player, opponent, settings, random.getrandbits(32)))
+                   for _ in range(self.workers)]
+        visits = {}
+        iterations = 0
+        for child_visits, done in self.wait_for_pool(pending):
+            iterations += done
+            for move_key, count in child_visits.items():
+                visits[move_key] = visits.get(move_key, 0) + count
+        best_move = max(possible_moves, key=lambda m: visits.get(board.get_move_code(gameboard, m), 0))
+        return best_move, iterations
+
+    def get_root(self, gameboard, player, opponent):
+        """
+        Returns the node of the current position from the previous search's
+        tree: normally the grandchild reached by our last move and the
+        opponent's reply, or a child if the tree was grown by ponder_search.
+        It becomes the new root, which frees the rest of the old tree.
+        Falls back to a new root when it is not in the tree.
+        """
+        if self.reuse_tree and self.root is not None:
+            position_hash = gameboard.zobrist
+            for node in self.reusable_nodes(self.root):
+                if node.position_hash == position_hash and node.player is player and node.opponent is opponent:
+                    node.parent = None
+                    if constants.VERBOSITY > 1:
+                        print("MCTS reusing subtree with %d visits" % node.visits)
+                    return node
+        return MCTSNode(gameboard, player, opponent)
+
+    def reusable_nodes(self, root):
+        # The old root, its children and grandchildren
+        yield root
+        for child in root.children:
+            yield child
+            for grandchild in child.children:
+                yield grandchild
+
+    def can_expand(self, node, gameboard):
+        if self.widening_constant is not None:
+            if len(node.children) >= max(1, int(self.widening_constant * node.visits ** self.widening_exponent)):
+                return False
+        return node.has_untried_moves(gameboard)
+
+    def run_iteration(self, root, gameboard):
+        node = root
+        moves_applied = 0
         
-        # Set a time limit for MCTS (e.g., 2 seconds)
-        # end_time = time.time() + 2.0 
-        # while time.time() < end_time:
+        # 1. Select
+        while node.children and not self.can_expand(node, gameboard):
+            node = node.uct_select_child(self.exploration_constant, self.rave_equivalence if self.rave else None)
+            gameboard.apply_move(node.get_move(gameboard), node.parent.player, node.parent.players_list)
+            moves_applied += 1
         
-        for _ in range(self.iterations):
-            node = root
-            
-            # 1. Select
-            while not node.untried_moves and node.children:
-                node = node.uct_select_child()
-            
-            # 2. Expand
-            if node.untried_moves:
-                node = node.expand()
-                if node is None: 
-                    node = root
-
-            # 3. Simulate
-            if node: 
-                result = node.simulate()
-                # 4. Backpropagate
-                node.backpropagate(result)
-            
-        # After iterations, choose the move that led to the most visited child
-        if not root.children:
-            return None # No possible moves
-            
-        best_child = max(root.children, key=lambda c: c.visits)
-        return best_child.move
\ No newline at end of file
+        # 2. Expand
+        if node.has_untried_moves(gameboard):
+            node = node.expand(gameboard)
+            moves_applied += 1
+
+        # 3. Simulate
+        played = [] if self.rave else None
+        if self.fast_rollouts:
+            result = node.fast_simulate(gameboard, played)
+        else:
+            result = node.simulate(gameboard, played)
+        # 4. Backpropagate
+        node.backpropagate(result)
+        if self.rave:
+            node.update_amaf(result, played)
+
+        # Return the board to the root position for the next iteration
+        for _ in range(moves_applied):
+            gameboard.undo_move()
\ No newline at end of file
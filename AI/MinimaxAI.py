@@ -1,61 +1,542 @@
-import copy
+import time, math, os
+import multiprocessing
 import board, pieces, constants
-from .cost_function.GreedyEvaluate import main as GreedyEvaluate
+from .cost_function.GreedyEvaluate import main as GreedyEvaluate, evaluate_moves
+from .TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from .Searcher import Searcher
 
-class Minimax:
-    def __init__(self, player_color, player_number, depth=2):
+# XORed into the position hash on the minimizing side. Both searchers' turns are
+# driven by the same board, so this keeps the two sides apart in the table
+# whatever the board's own side_to_move says.
+MINIMIZING_KEY = 0x9E3779B97F4A7C15
+
+# Leaves scored by the first evaluate_moves call under a depth-1 node
+FIRST_LEAF_BATCH = 4
+
+# Shallower iterations finish before the root moves could reach the pool
+PARALLEL_MIN_DEPTH = 3
+
+# Pondering deepens this many of the opponent's likeliest replies together,
+# one depth at a time, spending at most PONDER_REPLY_SLICE seconds on a
+# reply before moving on to the next
+PONDER_REPLIES = 6
+PONDER_REPLY_SLICE = 0.25
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the per-move time budget runs out."""
+    pass
+
+class LeafEvaluations:
+    """
+    Evaluations of the children of a depth-1 node, which are all leaves,
+    indexed like its move list. They are scored with evaluate_moves in
+    batches that double in size: with good ordering the first few moves
+    usually decide a cutoff, so the rest are only scored when needed.
+    """
+    def __init__(self, searcher, gameboard, player, opponent, mover, possible_moves):
+        self.searcher = searcher
+        self.gameboard = gameboard
+        self.player = player
+        self.opponent = opponent
+        self.mover = mover
+        self.possible_moves = possible_moves
+        self.evaluations = []
+        self.batch_size = FIRST_LEAF_BATCH
+
+    def __getitem__(self, index):
+        while index >= len(self.evaluations):
+            start = len(self.evaluations)
+            batch = self.possible_moves[start:start + self.batch_size]
+            self.evaluations.extend(evaluate_moves(self.gameboard, self.player, self.opponent, self.mover, batch))
+            self.searcher.nodes += len(batch) # The leaves count as searched nodes
+            self.batch_size *= 2
+        return self.evaluations[index]
+
+# Per-process state of the root-parallel search workers, set by _init_worker
+_worker = {}
+
+def _init_worker(shared_stop, shared_alpha, depth, tt_size_mb, ordering_heuristics):
+    # The searcher lives as long as the worker, so its transposition table,
+    # killers and history stay warm from one chunk and iteration to the next
+    searcher = Minimax(None, None, depth, tt_size_mb, ordering_heuristics=ordering_heuristics, endgame_threshold=None)
+    searcher.should_stop = lambda: bool(shared_stop.value)
+    _worker["shared_alpha"] = shared_alpha
+    _worker["searcher"] = searcher
+    _worker["position"] = None
+
+def _search_root_moves(gameboard, player, opponent, move_codes, depth, pv, deadline):
+    """
+    Runs in a worker process: plays each of a chunk of root moves, given as
+    (root index, board.get_move_code) pairs, on the worker's copy of the
+    board and searches the reply. The window starts at the best root value
+    found so far by any worker, as it would in the serial search; exact is
+    False for a move that failed low, whose value is then only an upper
+    bound. Returns ([(root index, value, exact, child pv)], nodes), or None
+    on timeout or when the search is stopped.
+    """
+    shared_alpha = _worker["shared_alpha"]
+    searcher = _worker["searcher"]
+    if _worker["position"] != gameboard.zobrist:
+        # A new move to find: age the ordering tables as find_best_move does
+        _worker["position"] = gameboard.zobrist
+        searcher.new_search()
+    searcher.nodes = 0
+    searcher.pv = pv
+    # Deadlines cross process boundaries as wall-clock time
+    searcher.deadline = None if deadline is None else time.perf_counter() + (deadline - time.time())
+
+    players_list = [player, opponent]
+    results = []
+    try:
+        for index, move_code in move_codes:
+            searcher.pv_table = {}
+            alpha = shared_alpha.value
+            gameboard.apply_move(board.move_from_code(gameboard, move_code), player, players_list)
+            try:
+                value, _ = searcher.minimax_alpha_beta(gameboard, player, opponent, depth - 1, alpha, constants.INFINITY, False, 1)
+            finally:
+                gameboard.undo_move()
+            if value > alpha:
+                with shared_alpha.get_lock():
+                    if value > shared_alpha.value:
+                        shared_alpha.value = value
+            results.append((index, value, value > alpha, searcher.pv_table.get(1, [])))
+    except SearchTimeout:
+        return None
+    finally:
+        searcher.deadline = None
+    return results, searcher.nodes
+
+class Minimax(Searcher):
+    process_local = Searcher.process_local + ("shared_alpha", "tt")
+
+    def __init__(self, player_color, player_number, depth=2, tt_size_mb=16, time_limit=None, ordering_heuristics=True, workers=None,
+                 endgame_threshold=12, ponder=False, ponder_cpu_share=0.5, use_book=False):
         self.color = player_color
         self.number = player_number
+        # Fixed search depth, or the deepest iteration tried when time_limit is set
         self.depth = depth
+        # Per-move budget in seconds for iterative deepening (None searches to depth)
+        self.time_limit = time_limit
+        # Transposition table shared by all searches of this AI (None disables it)
+        self.tt_size_mb = tt_size_mb
+        self.tt = None
+        self.deadline = None
+        self.pv = []          # Principal variation (move keys) of the last completed iteration
+        self.pv_table = {}    # PV being built by the current iteration, per ply
+        self.last_depth_reached = 0
+        # Killer moves (two per ply) and history scores keyed by board.get_move_key,
+        # i.e. (orientation id, top-left x, y): one key per placement, however
+        # many anchors it covers. Turning them off is only useful to measure
+        # what they save in node counts.
+        self.ordering_heuristics = ordering_heuristics
+        self.killers = {}
+        self.history = {}
+        self.nodes = 0
+        self.last_node_count = 0
+        # Number of processes the root moves are split across (None or 1 searches serially).
+        # It is capped at the number of CPUs, so with a single CPU the search stays serial.
+        self.workers = workers
+        self.shared_alpha = None
+        self.ponder_position = None # Hash of the position being pondered
+        self.ponder_replies = []    # (move, hash) of the opponent replies not fully searched, likeliest first
+        self.pondered = {}          # (depth, move, PV) reached for each reply searched, by hash
+        self.init_searcher(endgame_threshold, ponder, ponder_cpu_share, use_book)
+
+    def reset_tables(self):
+        Searcher.reset_tables(self)
+        self.tt = TranspositionTable(self.tt_size_mb) if self.tt_size_mb else None
+
+    def close(self):
+        Searcher.close(self)
+        self.shared_alpha = None
+
+    def parallel_workers(self):
+        """Number of processes the root moves are actually split across."""
+        if self.workers is None:
+            return 1
+        return max(1, min(self.workers, os.cpu_count() or 1))
 
     def find_best_move(self, gameboard, player, opponent):
-        _, best_move = self.minimax_alpha_beta(gameboard, player, opponent, self.depth, constants.M_INFINITY, constants.INFINITY, True)
+        move_start = time.perf_counter()
+        if self.endgame is not None:
+            best_move = self.endgame.try_solve(gameboard, player, opponent, self.time_limit)
+            if best_move is not None:
+                return best_move
+        # The opponent may have played a reply we searched while pondering
+        pondered = self.pondered.get(gameboard.zobrist)
+        self.pondered = {}
+        self.ponder_position = None
+        if pondered is not None:
+            if constants.VERBOSITY > 0:
+                print("Minimax ponder hit at depth %d" % pondered[0])
+            if pondered[0] >= self.depth:
+                return pondered[1]
+        self.new_search()
+        if self.time_limit is None:
+            self.pv = []
+            try:
+                _, best_move = self.search_root(gameboard, player, opponent, self.depth)
+            except SearchTimeout:
+                return None # Stopped by should_stop: nobody wants the answer
+            self.last_depth_reached = self.depth
+        else:
+            # A failed endgame solve has used part of this move's budget
+            start = time.perf_counter()
+            time_limit = max(0.0, self.time_limit - (start - move_start))
+            best_move = self.iterative_deepening(gameboard, player, opponent, time_limit, pondered)
+            if constants.VERBOSITY > 0:
+                print("Minimax reached depth %d in %.2fs" % (self.last_depth_reached, time.perf_counter() - start))
+        self.last_node_count = self.nodes
+        if constants.VERBOSITY > 1:
+            print("Minimax searched %d nodes" % self.nodes)
+            if self.tt is not None:
+                print("Minimax TT: %d hits, %d misses" % (self.tt.hits, self.tt.misses))
+        return best_move
+
+    def new_search(self):
+        # Killers are tied to plies of the previous search, history only fades
+        self.killers = {}
+        for key in self.history:
+            self.history[key] //= 2
+        self.nodes = 0
+
+    def iterative_deepening(self, gameboard, player, opponent, time_limit, resume=None, max_depth=None):
+        """
+        Searches depth 1, 2, ... until time_limit seconds have passed and
+        returns the best move of the last iteration that finished. Each
+        iteration searches the previous principal variation first, and the
+        transposition table carries the rest of the move ordering over.
+        resume, a (depth, move, principal variation) found earlier for this
+        position, starts the search at the next depth instead. max_depth
+        stops it before self.depth.
+        """
+        self.deadline = time.perf_counter() + time_limit
+        self.pv = []
+        self.last_depth_reached = 0
+        best_move = None
+        if resume is not None:
+            self.last_depth_reached, best_move, self.pv = resume
+        try:
+            for depth in range(self.last_depth_reached + 1, (max_depth or self.depth) + 1):
+                try:
+                    _, move = self.search_root(gameboard, player, opponent, depth)
+                except SearchTimeout:
+                    break
+                best_move = move
+                self.last_depth_reached = depth
+                self.pv = self.pv_table.get(0, [])
+                if move is None:
+                    break # No moves to choose from
+        finally:
+            self.deadline = None
+
+        if best_move is None and self.last_depth_reached == 0:
+            # Not even depth 1 finished: fall back to the largest piece we can play
+            possible_moves = board.return_all_pending_moves(gameboard, player)
+            if possible_moves:
+                best_move = max(possible_moves, key=lambda m: pieces.get_piece_size(m['piece']))
         return best_move
 
-    def minimax_alpha_beta(self, gameboard, player, opponent, depth, alpha, beta, maximizing_player):
+    def ponder_search(self, gameboard, player, opponent, should_stop):
+        """
+        Searches while opponent is to move in gameboard, until should_stop()
+        returns True or every reply has been searched. The opponent's
+        PONDER_REPLIES likeliest replies are deepened breadth-first: the
+        shallowest one is searched one depth further, for at most
+        PONDER_REPLY_SLICE seconds, and so on, so all of them are covered
+        before any goes deep. A reply searched to full depth makes room for
+        the next likeliest. If a searched reply is played, find_best_move
+        goes on from the depth reached; the transposition table helps with
+        the others.
+        """
+        if self.parallel_workers() > 1:
+            return # The pool's workers keep their own tables
+        if self.ponder_position != gameboard.zobrist:
+            self.ponder_position = gameboard.zobrist
+            self.ponder_replies = [(move, gameboard.get_child_zobrist(move, opponent.number))
+                                   for move in self.predict_replies(gameboard, player, opponent)]
+            self.pondered = {}
+        self.should_stop = should_stop
+        try:
+            while not should_stop():
+                self.ponder_replies = [reply for reply in self.ponder_replies if self.pondered_depth(reply[1]) < self.depth]
+                if not self.ponder_replies:
+                    break
+                move, position_hash = min(self.ponder_replies[:PONDER_REPLIES], key=lambda reply: self.pondered_depth(reply[1]))
+                resume = self.pondered.get(position_hash)
+                gameboard.apply_move(move, opponent, [opponent, player])
+                try:
+                    best_move = self.iterative_deepening(gameboard, player, opponent, PONDER_REPLY_SLICE, resume,
+                                                         self.pondered_depth(position_hash) + 1)
+                finally:
+                    gameboard.undo_move()
+                if best_move is None and self.last_depth_reached > 0:
+                    self.pondered[position_hash] = (self.depth, None, []) # No move to search for
+                elif self.last_depth_reached > 0:
+                    self.pondered[position_hash] = (self.last_depth_reached, best_move, self.pv)
+        finally:
+            self.should_stop = None
+
+    def pondered_depth(self, position_hash):
+        pondered = self.pondered.get(position_hash)
+        return 0 if pondered is None else pondered[0]
+
+    def predict_replies(self, gameboard, player, opponent):
+        # The opponent's moves by how good they look to the opponent after one ply
+        players_list = [opponent, player]
+        scored = []
+        for move in board.return_all_pending_moves(gameboard, opponent):
+            gameboard.apply_move(move, opponent, players_list)
+            try:
+                scored.append((GreedyEvaluate(gameboard, opponent, player), len(scored), move))
+            finally:
+                gameboard.undo_move()
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [move for _, _, move in scored]
+
+    def search_root(self, gameboard, player, opponent, depth):
+        if self.parallel_workers() <= 1 or depth < PARALLEL_MIN_DEPTH:
+            return self.minimax_alpha_beta(gameboard, player, opponent, depth, constants.M_INFINITY, constants.INFINITY, True)
+        return self.parallel_root_search(gameboard, player, opponent, depth)
+
+    def parallel_root_search(self, gameboard, player, opponent, depth):
+        """
+        Returns the same value and move as minimax_alpha_beta at the root.
+        The root moves are ordered here exactly as the serial search orders
+        them. The first one is searched here, which sets the bound the others
+        start from; the rest are dealt round-robin into one chunk per worker,
+        so the position is sent once per worker and the likeliest moves are
+        spread across them. The best value wins and ties go to the earliest
+        move in that order: a move before the best one that failed low at
+        exactly the best value may tie it, so those are searched again here.
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        self.nodes += 1
         players_list = [player, opponent]
+        self.pv_table[0] = []
         if depth == 0 or board.is_game_over(gameboard, players_list):
             return GreedyEvaluate(gameboard, player, opponent), None
 
+        tt_key = gameboard.zobrist
+        tt_move_key = None
+        if self.tt is not None:
+            entry = self.tt.probe(tt_key)
+            if entry is not None:
+                tt_move_key = entry[4]
+        possible_moves = board.return_all_pending_moves(gameboard, player)
+        self.order_moves(possible_moves, 0, tt_move_key)
+        if not possible_moves:
+            return constants.M_INFINITY, None
+
+        gameboard.apply_move(possible_moves[0], player, players_list)
+        try:
+            best_eval, _ = self.minimax_alpha_beta(gameboard, player, opponent, depth - 1,
+                                                   constants.M_INFINITY, constants.INFINITY, False, 1)
+        finally:
+            gameboard.undo_move()
+        best_index = 0
+        best_pv = self.pv_table.get(1, [])
+        results = self.search_root_chunks(gameboard, player, opponent, possible_moves, depth, best_eval)
+        for index, value, exact, child_pv in results:
+            if exact and (value > best_eval or (value == best_eval and index < best_index)):
+                best_eval = value
+                best_index = index
+                best_pv = child_pv
+        ties = sorted(index for index, value, exact, _ in results if not exact and value == best_eval and index < best_index)
+        alpha = math.nextafter(best_eval, constants.M_INFINITY)
+        for index in ties:
+            gameboard.apply_move(possible_moves[index], player, players_list)
+            try:
+                value, _ = self.minimax_alpha_beta(gameboard, player, opponent, depth - 1, alpha, constants.INFINITY, False, 1)
+            finally:
+                gameboard.undo_move()
+            if value > alpha:
+                best_index = index
+                best_pv = self.pv_table.get(1, [])
+                break
+
+        best_move = possible_moves[best_index]
+        best_move_key = board.get_move_key(best_move)
+        self.pv_table[0] = [best_move_key] + best_pv
+        if self.tt is not None:
+            self.tt.store(tt_key, depth, EXACT, best_eval, best_move_key)
+        return best_eval, best_move
+
+    def search_root_chunks(self, gameboard, player, opponent, possible_moves, depth, alpha):
+        """
+        Searches possible_moves[1:] in the pool with the bound alpha and
+        returns their (root index, value, exact, child pv). Raises SearchTimeout
+        when the deadline passes or should_stop fires; the workers are told
+        to stop and waited for, so the pool is free for the next search.
+        """
+        count = self.parallel_workers()
+        if self.pool is None:
+            self.shared_alpha = multiprocessing.Value('d', constants.M_INFINITY)
+        self.start_pool(count, _init_worker, (self.shared_alpha, self.depth, self.tt_size_mb, self.ordering_heuristics))
+        self.shared_alpha.value = alpha
+        indexed = [(index, board.get_move_code(gameboard, move)) for index, move in enumerate(possible_moves)][1:]
+        deadline = None if self.deadline is None else time.time() + (self.deadline - time.perf_counter())
+        pending = [self.pool.apply_async(_search_root_moves, (gameboard, player, opponent, indexed[i::count], depth, self.pv, deadline))
+                   for i in range(min(count, len(indexed)))]
+        outputs = self.wait_for_pool(pending, self.deadline)
+        if any(output is None for output in outputs):
+            raise SearchTimeout()
+        results = []
+        for chunk_results, nodes in outputs:
+            self.nodes += nodes
+            results.extend(chunk_results)
+        return results
+
+    def minimax_alpha_beta(self, gameboard, player, opponent, depth, alpha, beta, maximizing_player, ply=0):
+        # Moves are played on gameboard with apply_move and taken back with
+        # undo_move, so the board and players are unchanged when this returns
+        # (also when SearchTimeout unwinds the search).
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if self.should_stop is not None and self.should_stop():
+            raise SearchTimeout()
+        self.nodes += 1
+        players_list = [player, opponent]
+        self.pv_table[ply] = []
+
+        # Transposition table lookup. The root always searches so that it has a move to return.
+        tt_key = gameboard.zobrist if maximizing_player else gameboard.zobrist ^ MINIMIZING_KEY
+        tt_move_key = None
+        alpha_orig, beta_orig = alpha, beta
+        if self.tt is not None:
+            entry = self.tt.probe(tt_key)
+            if entry is not None:
+                _, tt_depth, tt_flag, tt_score, tt_move_key = entry
+                if tt_depth >= depth and ply > 0:
+                    if tt_flag == EXACT:
+                        return tt_score, None
+                    elif tt_flag == LOWER_BOUND:
+                        alpha = max(alpha, tt_score)
+                    elif tt_flag == UPPER_BOUND:
+                        beta = min(beta, tt_score)
+                    if beta <= alpha:
+                        return tt_score, None
+
+        if depth == 0 or board.is_game_over(gameboard, players_list):
+            evaluation = GreedyEvaluate(gameboard, player, opponent)
+            if self.tt is not None:
+                # Leaves are stored too: A-X-B and B-X-A meet here from depth 3 up
+                self.tt.store(tt_key, depth, EXACT, evaluation, None)
+            return evaluation, None
+
         if maximizing_player:
             max_eval = constants.M_INFINITY
             best_move = None
             possible_moves = board.return_all_pending_moves(gameboard, player)
-            
-            possible_moves.sort(key=lambda m: pieces.get_piece_size(m['piece']), reverse=True)
-
-            for move in possible_moves:
-                gameboard_copy = copy.deepcopy(gameboard)
-                player_copy = copy.deepcopy(player)
-                opponent_copy = copy.deepcopy(opponent)
-                
-                if gameboard_copy.fit_piece(move, player_copy, [player_copy, opponent_copy]):
-                    evaluation, _ = self.minimax_alpha_beta(gameboard_copy, player_copy, opponent_copy, depth - 1, alpha, beta, False)
-                    if evaluation > max_eval:
-                        max_eval = evaluation
-                        best_move = move
-                    alpha = max(alpha, evaluation)
-                    if beta <= alpha:
-                        break
-            return max_eval, best_move
+            if not possible_moves:
+                # Stuck while the opponent can still move (the game is not over): pass
+                return self.minimax_alpha_beta(gameboard, player, opponent, depth - 1, alpha, beta, False, ply + 1)
+            self.order_moves(possible_moves, ply, tt_move_key)
+            leaf_evaluations = self.evaluate_leaves(gameboard, player, opponent, player, possible_moves, depth, ply)
+
+            for index, move in enumerate(possible_moves):
+                if leaf_evaluations is not None:
+                    evaluation = leaf_evaluations[index]
+                elif gameboard.apply_move(move, player, players_list):
+                    try:
+                        evaluation, _ = self.minimax_alpha_beta(gameboard, player, opponent, depth - 1, alpha, beta, False, ply + 1)
+                    finally:
+                        gameboard.undo_move()
+                else:
+                    continue
+                if evaluation > max_eval:
+                    max_eval = evaluation
+                    best_move = move
+                    self.update_pv(ply, move)
+                alpha = max(alpha, evaluation)
+                if beta <= alpha:
+                    self.record_cutoff(move, ply, depth)
+                    break
+            best_eval = max_eval
         else: 
             min_eval = constants.INFINITY
             best_move = None
             possible_moves = board.return_all_pending_moves(gameboard, opponent)
+            if not possible_moves:
+                return self.minimax_alpha_beta(gameboard, player, opponent, depth - 1, alpha, beta, True, ply + 1)
+            self.order_moves(possible_moves, ply, tt_move_key)
+            leaf_evaluations = self.evaluate_leaves(gameboard, player, opponent, opponent, possible_moves, depth, ply)
 
-            possible_moves.sort(key=lambda m: pieces.get_piece_size(m['piece']), reverse=True)
+            for index, move in enumerate(possible_moves):
+                if leaf_evaluations is not None:
+                    evaluation = leaf_evaluations[index]
+                elif gameboard.apply_move(move, opponent, players_list):
+                    try:
+                        evaluation, _ = self.minimax_alpha_beta(gameboard, player, opponent, depth - 1, alpha, beta, True, ply + 1)
+                    finally:
+                        gameboard.undo_move()
+                else:
+                    continue
+                if evaluation < min_eval:
+                    min_eval = evaluation
+                    best_move = move
+                    self.update_pv(ply, move)
+                beta = min(beta, evaluation)
+                if beta <= alpha:
+                    self.record_cutoff(move, ply, depth)
+                    break
+            best_eval = min_eval
 
-            for move in possible_moves:
-                gameboard_copy = copy.deepcopy(gameboard)
-                player_copy = copy.deepcopy(player)
-                opponent_copy = copy.deepcopy(opponent)
+        if self.tt is not None:
+            if best_eval <= alpha_orig:
+                flag = UPPER_BOUND
+            elif best_eval >= beta_orig:
+                flag = LOWER_BOUND
+            else:
+                flag = EXACT
+            best_move_key = board.get_move_key(best_move) if best_move is not None else None
+            self.tt.store(tt_key, depth, flag, best_eval, best_move_key)
+        return best_eval, best_move
 
-                if gameboard_copy.fit_piece(move, opponent_copy, [player_copy, opponent_copy]):
-                    evaluation, _ = self.minimax_alpha_beta(gameboard_copy, player_copy, opponent_copy, depth - 1, alpha, beta, True)
-                    if evaluation < min_eval:
-                        min_eval = evaluation
-                        best_move = move
-                    beta = min(beta, evaluation)
-                    if beta <= alpha:
-                        break
-            return min_eval, best_move
\ No newline at end of file
+    def evaluate_leaves(self, gameboard, player, opponent, mover, possible_moves, depth, ply):
+        # At depth 1 the children are scored in batches (see LeafEvaluations)
+        # instead of being searched one by one
+        if depth != 1 or not possible_moves:
+            return None
+        self.pv_table[ply + 1] = [] # Leaves have no continuation
+        return LeafEvaluations(self, gameboard, player, opponent, mover, possible_moves)
+
+    def update_pv(self, ply, move):
+        self.pv_table[ply] = [board.get_move_key(move)] + self.pv_table.get(ply + 1, [])
+
+    def record_cutoff(self, move, ply, depth):
+        if not self.ordering_heuristics:
+            return
+        move_key = board.get_move_key(move)
+        killers = self.killers.setdefault(ply, [])
+        if move_key not in killers:
+            killers.insert(0, move_key)
+            del killers[2:]
+        # Cutoffs near the root prune more, so they count for more
+        self.history[move_key] = self.history.get(move_key, 0) + depth * depth
+
+    def order_moves(self, possible_moves, ply, tt_move_key):
+        """
+        Sorts moves in place: the table's best move, then the previous
+        iteration's PV move for this ply, then this ply's killer moves, then by
+        history score and finally by piece size, biggest first.
+        """
+        pv_move_key = self.pv[ply] if ply < len(self.pv) else None
+        if self.ordering_heuristics:
+            killers = self.killers.get(ply, ())
+            history = self.history
+        else:
+            killers, history = (), {}
+
+        def priority(move):
+            move_key = board.get_move_key(move)
+            if move_key == tt_move_key:
+                return (4, 0, 0)
+            if move_key == pv_move_key:
+                return (3, 0, 0)
+            if move_key in killers:
+                return (2, 0, 0)
+            return (1, history.get(move_key, 0), pieces.get_piece_size(move['piece']))
+        possible_moves.sort(key=priority, reverse=True)
\ No newline at end of file
@@ -0,0 +1,173 @@
+import os, struct, random, argparse
+import numpy as np
+import board, pieces, constants, player
+
+# Book files live next to this module, one per board size and player count
+BOOK_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book")
+BOOK_MAGIC = b"BLKB"
+BOOK_VERSION = 1
+# magic, version, rows, cols, player count, most occupied cells of any entry, entry count
+HEADER = struct.Struct("<4sHHHHHI")
+# canonical position key, move code in the canonical frame
+ENTRY = struct.Struct("<QI")
+
+# Loaded books keyed by (rows, cols, player_count): (max_cells, {key: move_code})
+_books = {}
+
+# The 8 symmetries of a square board as (x, y) -> (x', y') on an n x n grid,
+# with the index of each one's inverse
+TRANSFORMS = [
+    lambda x, y, n: (x, y),
+    lambda x, y, n: (y, n - 1 - x),
+    lambda x, y, n: (n - 1 - x, n - 1 - y),
+    lambda x, y, n: (n - 1 - y, x),
+    lambda x, y, n: (y, x),
+    lambda x, y, n: (n - 1 - x, y),
+    lambda x, y, n: (n - 1 - y, n - 1 - x),
+    lambda x, y, n: (x, n - 1 - y),
+]
+INVERSES = [0, 3, 2, 1, 4, 5, 6, 7]
+
+def get_book_path(rows, cols, player_count):
+    return os.path.join(BOOK_FOLDER, "book_%dx%d_%dp.bin" % (rows, cols, player_count))
+
+def get_symmetries(gameboard):
+    """Indexes of the TRANSFORMS that leave every player's start point where it is."""
+    if gameboard.rows != gameboard.cols:
+        return [0]
+    n = gameboard.rows
+    symmetries = []
+    for index, transform in enumerate(TRANSFORMS):
+        if all(list(transform(x, y, n)) == [x, y] for x, y in gameboard.start_points.values()):
+            symmetries.append(index)
+    return symmetries
+
+def get_canonical_key(gameboard, p_num):
+    """
+    Returns (key, transform index) for the position with player p_num to
+    move. The key is the smallest Zobrist-style hash of the position over
+    the board's symmetries, the transform the one that produced it.
+    Pieces are not hashed: a player's pieces never share an edge, so the
+    cells already tell them apart.
+    """
+    cols = gameboard.cols
+    cell_keys = board.get_zobrist_cell_keys(gameboard.rows * cols)
+    cells = [(owner, divmod(cell, cols)) for owner, occupancy in gameboard.occupancy.items()
+             for cell in board.iter_bits(occupancy)]
+    best = None
+    for index in get_symmetries(gameboard):
+        transform = TRANSFORMS[index]
+        key = board.ZOBRIST_SIDE[p_num]
+        for owner, (x, y) in cells:
+            x, y = transform(x, y, gameboard.rows)
+            key ^= cell_keys[owner][x * cols + y]
+        if best is None or key < best[0]:
+            best = (key, index)
+    return best
+
+def transform_move(gameboard, move, index):
+    """The move dict for move's cells mapped through TRANSFORMS[index]."""
+    orientation = pieces.ORIENTATIONS[board.get_move_key(move)[0]]
+    pos_x, pos_y = move["place_on_board_at"]
+    cells = [TRANSFORMS[index](pos_x + i, pos_y + j, gameboard.rows) for i, j in orientation.cells]
+    min_x = min(x for x, _ in cells)
+    min_y = min(y for _, y in cells)
+    arr = np.zeros((max(x for x, _ in cells) - min_x + 1, max(y for _, y in cells) - min_y + 1), dtype=int)
+    for x, y in cells:
+        arr[x - min_x][y - min_y] = 1
+    return board.make_move(pieces.find_orientation(arr), [min_x, min_y])
+
+def load_book(rows, cols, player_count):
+    """Reads a book file into (max_cells, {key: move_code}); an empty book if there is none."""
+    path = get_book_path(rows, cols, player_count)
+    if not os.path.exists(path):
+        return 0, {}
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, book_rows, book_cols, book_players, max_cells, count = HEADER.unpack_from(data, 0)
+    if magic != BOOK_MAGIC or version != BOOK_VERSION or (book_rows, book_cols, book_players) != (rows, cols, player_count):
+        if constants.VERBOSITY > 0:
+            print("Ignoring opening book %s: wrong format or board" % path)
+        return 0, {}
+    entries = dict(ENTRY.iter_unpack(data[HEADER.size:HEADER.size + count * ENTRY.size]))
+    return max_cells, entries
+
+def save_book(path, rows, cols, player_count, max_cells, entries):
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(BOOK_MAGIC, BOOK_VERSION, rows, cols, player_count, max_cells, len(entries)))
+        for key in sorted(entries):
+            f.write(ENTRY.pack(key, entries[key]))
+
+def get_book(gameboard):
+    book_id = (gameboard.rows, gameboard.cols, gameboard.player_count)
+    book = _books.get(book_id)
+    if book is None:
+        book = load_book(*book_id)
+        _books[book_id] = book
+    return book
+
+def find_book_move(gameboard, ai_player):
+    """The book move for ai_player in the current position, or None if it is out of book."""
+    max_cells, entries = get_book(gameboard)
+    if not entries or bin(gameboard.occupied).count("1") > max_cells:
+        return None
+    key, index = get_canonical_key(gameboard, ai_player.number)
+    move_code = entries.get(key)
+    if move_code is None:
+        return None
+    move = transform_move(gameboard, board.move_from_code(gameboard, move_code), INVERSES[index])
+    if not gameboard.check_is_orientation_valid(move["orientation"], ai_player, move["place_on_board_at"]):
+        return None # Hash collision
+    if constants.VERBOSITY > 0:
+        print("Opening book move for player %d: %s at %s" % (ai_player.number, move["piece"], move["place_on_board_at"]))
+    return move
+
+def generate_book(rows, cols, player_count, plies, games, time_limit, explore=0.5):
+    """
+    Builds a book from self-play: each game plays the first plies moves,
+    running a long MCTS search for every position not yet in the book and
+    storing its answer. After a search the move actually played is a random
+    legal one with probability explore, so later games reach other lines.
+    """
+    from .MCTS_AI import MCTS
+    entries = {}
+    max_cells = 0
+    for game in range(games):
+        gameboard = board.Board(rows, cols, player_count)
+        players = [player.Player(i + 1, None, True) for i in range(player_count)]
+        for ply in range(plies):
+            mover = players[ply % player_count]
+            opponent = players[(ply + 1) % player_count]
+            possible_moves = board.return_all_pending_moves(gameboard, mover)
+            if not possible_moves:
+                break
+            key, index = get_canonical_key(gameboard, mover.number)
+            if key in entries:
+                move = transform_move(gameboard, board.move_from_code(gameboard, entries[key]), INVERSES[index])
+            else:
+                searcher = MCTS(None, mover.number, time_limit=time_limit, reuse_tree=False)
+                move = searcher.find_best_move(gameboard, mover, opponent)
+                entries[key] = board.get_move_code(gameboard, transform_move(gameboard, move, index))
+                max_cells = max(max_cells, bin(gameboard.occupied).count("1"))
+                print("Game %d ply %d: %d positions in book" % (game + 1, ply + 1, len(entries)))
+            if random.random() < explore:
+                move = random.choice(possible_moves)
+            gameboard.fit_piece(move, mover, players)
+    return max_cells, entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an opening book by self-play.")
+    parser.add_argument("--rows", type=int, default=constants.ROW_COUNT_2P)
+    parser.add_argument("--cols", type=int, default=constants.COLUMN_COUNT_2P)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--plies", type=int, default=4)
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30.0, help="search time per book position")
+    args = parser.parse_args()
+
+    constants.VERBOSITY = 0
+    max_cells, entries = generate_book(args.rows, args.cols, args.players, args.plies, args.games, args.seconds)
+    os.makedirs(BOOK_FOLDER, exist_ok=True)
+    path = get_book_path(args.rows, args.cols, args.players)
+    save_book(path, args.rows, args.cols, args.players, max_cells, entries)
+    print("Wrote %d positions to %s" % (len(entries), path))
\ No newline at end of file
@@ -0,0 +1,90 @@
+import time
+import multiprocessing
+from .EndgameSolver import EndgameSolver
+
+# Seconds between two checks of the deadline and should_stop while a
+# parallel search waits for its workers
+POOL_POLL_INTERVAL = 0.05
+
+class Searcher:
+    """
+    What Minimax and MCTS have in common around the search itself: the
+    endgame solver, opening book and pondering settings, the worker pool of
+    the parallel search, and what stays behind when a searcher is sent to
+    another process with the players (search workers, AIWorker).
+    """
+    # Attributes that only make sense in this process; subclasses add theirs
+    process_local = ("pool", "shared_stop", "endgame", "should_stop")
+
+    def init_searcher(self, endgame_threshold, ponder, ponder_cpu_share, use_book):
+        # Exact solver used instead of the search once both players together
+        # have at most endgame_threshold legal moves (None never solves)
+        self.endgame_threshold = endgame_threshold
+        self.endgame = None
+        # Play the first moves from the opening book (see AIManager.choose_move)
+        self.use_book = use_book
+        # Search on the opponent's time (see ponder_search), using at most
+        # ponder_cpu_share of one core
+        self.ponder = ponder
+        self.ponder_cpu_share = ponder_cpu_share
+        # Callback that interrupts pondering or a search when it returns True (see AIWorker)
+        self.should_stop = None
+        # Worker pool of the parallel search and the flag that tells its
+        # workers to stop. The pool is started on the first search and kept until close().
+        self.pool = None
+        self.shared_stop = None
+        self.reset_tables()
+
+    def reset_tables(self):
+        """Gives the searcher empty tables."""
+        self.endgame = EndgameSolver(self.endgame_threshold) if self.endgame_threshold else None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.process_local:
+            state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        # The unpickled copy starts with empty tables
+        self.__dict__.update(state)
+        self.reset_tables()
+
+    def start_pool(self, processes, initializer, initargs=()):
+        """
+        Starts the worker pool if needed and clears its stop flag. The flag
+        is passed to initializer ahead of initargs.
+        """
+        if self.pool is None:
+            self.shared_stop = multiprocessing.Value('b', 0, lock=False)
+            self.pool = multiprocessing.Pool(processes, initializer=initializer, initargs=(self.shared_stop,) + tuple(initargs))
+        self.shared_stop.value = 0
+        return self.pool
+
+    def wait_for_pool(self, pending, deadline=None):
+        """
+        Returns the results of the pool's pending tasks, in order. The
+        workers are told to stop once should_stop fires or deadline (a
+        time.perf_counter value) passes, so this returns soon after.
+        """
+        for result in pending:
+            while not result.ready():
+                if deadline is not None and time.perf_counter() > deadline:
+                    self.shared_stop.value = 1
+                elif self.should_stop is not None and self.should_stop():
+                    self.shared_stop.value = 1
+                result.wait(POOL_POLL_INTERVAL)
+        self.shared_stop.value = 0
+        return [result.get() for result in pending]
+
+    def close(self):
+        """
+        Shuts down the worker processes of the parallel search, if any.
+        Tasks already running are killed rather than left to finish, so
+        the process exits without waiting for them.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            self.shared_stop = None
\ No newline at end of file
@@ -0,0 +1,53 @@
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Rough size of one stored entry (tuple + ints + slot pointer), used to turn
+# a size in MB into a number of slots
+ENTRY_BYTES = 128
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results keyed by Board.zobrist.
+    Each bucket has two slots: a depth-preferred slot that keeps the deepest
+    result seen for the bucket, and an always-replace slot that takes whatever
+    the depth-preferred slot refuses. Entries are (key, depth, flag, score, move_key).
+    """
+    def __init__(self, size_mb=16):
+        slot_count = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        # Round down to a power of two so the bucket index is a mask
+        self.bucket_count = 1 << (slot_count.bit_length() - 1)
+        self.mask = self.bucket_count - 1
+        self.clear()
+
+    def clear(self):
+        self.depth_slots = [None] * self.bucket_count
+        self.recent_slots = [None] * self.bucket_count
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        index = key & self.mask
+        entry = self.depth_slots[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.recent_slots[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, score, move_key):
+        index = key & self.mask
+        entry = (key, depth, flag, score, move_key)
+        current = self.depth_slots[index]
+        if current is None or current[0] == key or depth >= current[1]:
+            self.depth_slots[index] = entry
+        else:
+            self.recent_slots[index] = entry
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
\ No newline at end of file
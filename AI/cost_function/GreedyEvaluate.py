@@ -1,13 +1,139 @@
-import constants
+from collections import OrderedDict
+import numpy as np
+import board, pieces, constants
+
+# Evaluations kept per process; the oldest unused ones go first
+CACHE_SIZE = 1 << 16
+
+# (dx, dy) of the four diagonal neighbours of a cell
+DIAGONALS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+class EvaluationCache:
+    """
+    Bounded LRU of evaluations keyed by (Board.zobrist, player number,
+    opponent number, corner weight). The hash covers the cells and every
+    player's remaining pieces, which is all the evaluation looks at.
+    """
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+cache = EvaluationCache()
 
 def count_corners(player):
     return sum(len(v) for v in player.board_corners.values())
 
+def count_stacked_corners(own, empty):
+    """
+    Corners of one player on each board of a stack: own and empty are
+    (boards, rows, cols) bool arrays. Counted like Board.update_board_corners,
+    once per own cell and diagonal direction whose diagonal cell is empty and
+    whose two cells along the edges are not the player's.
+    """
+    count, rows, cols = own.shape
+    own_padded = np.zeros((count, rows + 2, cols + 2), dtype=bool)
+    own_padded[:, 1:-1, 1:-1] = own
+    empty_padded = np.zeros((count, rows + 2, cols + 2), dtype=bool)
+    empty_padded[:, 1:-1, 1:-1] = empty
+    corners = np.zeros(count, dtype=np.int64)
+    for dx, dy in DIAGONALS:
+        diagonal = empty_padded[:, 1 + dx:rows + 1 + dx, 1 + dy:cols + 1 + dy]
+        side_x = own_padded[:, 1 + dx:rows + 1 + dx, 1:-1]
+        side_y = own_padded[:, 1:-1, 1 + dy:cols + 1 + dy]
+        corners += (own & diagonal & ~side_x & ~side_y).sum(axis=(1, 2))
+    return corners
+
+def evaluate_batch(gameboard, player, opponent, mover, moves, corner_weight=2.0):
+    """
+    main for the position after each of mover's moves, without playing them:
+    the boards are stacked in one array and scored together.
+    """
+    stack_shape = (len(moves), gameboard.rows, gameboard.cols)
+    placed = np.zeros(stack_shape, dtype=bool)
+    indexes, xs, ys = [], [], []
+    for index, move in enumerate(moves):
+        orientation_id, x, y = board.get_move_key(move)
+        for i, j in pieces.ORIENTATIONS[orientation_id].cells:
+            indexes.append(index)
+            xs.append(x + i)
+            ys.append(y + j)
+    placed[indexes, xs, ys] = True
+
+    cells = gameboard.board
+    empty = (cells == board.empty) & ~placed
+    corners = {}
+    for p in (player, opponent):
+        own = np.broadcast_to(cells == p.number, stack_shape)
+        if p is mover:
+            own = own | placed
+        corners[p.number] = count_stacked_corners(own, empty)
+
+    # Only the mover's score changes, by the piece played
+    mover_scores = {}
+    for move in moves:
+        if move["piece"] not in mover_scores:
+            remaining = [name for name in mover.remaining_pieces if name != move["piece"]]
+            mover_scores[move["piece"]] = board.scoring_fn(remaining)
+    scores = {}
+    for p in (player, opponent):
+        if p is mover:
+            scores[p.number] = np.array([mover_scores[move["piece"]] for move in moves], dtype=np.int64)
+        else:
+            scores[p.number] = np.full(len(moves), p.score, dtype=np.int64)
+
+    score_diff = scores[player.number] - scores[opponent.number]
+    corner_diff = corners[player.number] - corners[opponent.number]
+    return (score_diff + corner_weight * corner_diff).tolist()
+
+def evaluate_moves(gameboard, player, opponent, mover, moves, corner_weight=2.0):
+    """
+    Evaluations from player's side of the positions after each of mover's
+    moves, in order. Cached positions are looked up and the rest are scored
+    in a single evaluate_batch call, so a search can evaluate all the leaves
+    under a node at once.
+    """
+    keys = [(gameboard.get_child_zobrist(move, mover.number), player.number, opponent.number, corner_weight)
+            for move in moves]
+    evaluations = [cache.get(key) for key in keys]
+    missing = [index for index, evaluation in enumerate(evaluations) if evaluation is None]
+    if missing:
+        batch = evaluate_batch(gameboard, player, opponent, mover, [moves[index] for index in missing], corner_weight)
+        for index, evaluation in zip(missing, batch):
+            evaluations[index] = evaluation
+            cache.put(keys[index], evaluation)
+    return evaluations
+
 def main(gameboard, player, opponent, corner_weight=2.0):
+    key = (gameboard.zobrist, player.number, opponent.number, corner_weight)
+    evaluation = cache.get(key)
+    if evaluation is not None:
+        return evaluation
+
     score_diff = player.score - opponent.score
     player_corners = count_corners(player)
     opponent_corners = count_corners(opponent)
     corner_diff = player_corners - opponent_corners
 
     evaluation = score_diff + (corner_weight * corner_diff)
+    cache.put(key, evaluation)
     return evaluation
\ No newline at end of file
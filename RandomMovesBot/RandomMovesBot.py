@@ -1,13 +1,11 @@
-import numpy as np, random, board, constants, pieces
+import random, board, constants, pieces
 
 def return_random_move(gameboard, player):
     if player.is_1st_move:
         return return_first_turn_move(gameboard, player) # First turn logic is fine
 
     # 1. Get all available corners
-    all_corners = []
-    for corner_list in player.board_corners.values():
-        all_corners.extend(corner_list)
+    all_corners = list(player.get_corner_coords())
     
     if not all_corners:
         if constants.VERBOSITY > 0:
@@ -23,23 +21,13 @@ def return_random_move(gameboard, player):
     
     # 3. Loop through pieces one by one
     for piece_name in remaining_pieces_keys:
-        piece_data = player.remaining_pieces[piece_name]
-        
-        # Get all orientations for this piece
-        orientations = pieces.get_all_piece_states_for_one_piece(piece_name, piece_data)
+        # Get all orientations for this piece from the catalog
+        orientations = list(pieces.PIECE_ORIENTATIONS[piece_name])
         random.shuffle(orientations)
         
-        for state in orientations:
-            arr = state["arr"]
-            
-            # Find all the blocks in this piece
-            piece_blocks = []
-            for r in range(arr.shape[0]):
-                for c in range(arr.shape[1]):
-                    if arr[r][c] == 1:
-                        piece_blocks.append((r, c))
-            
-            if not piece_blocks: continue
+        for orientation_id in orientations:
+            orientation = pieces.ORIENTATIONS[orientation_id]
+            piece_blocks = list(orientation.cells)
             
             # Shuffle corners and anchors for randomness
             random.shuffle(all_corners)
@@ -54,15 +42,9 @@ def return_random_move(gameboard, player):
                     board_y = corner_y - anchor_c
                     
                     # Check if this move is valid
-                    if gameboard.check_is_move_valid(arr, player, [board_x, board_y]):
+                    if gameboard.check_is_orientation_valid(orientation_id, player, [board_x, board_y]):
                         # SUCCESS! Found a move.
-                        move = {
-                            "piece": piece_name, 
-                            "flipped": state["flipped"],
-                            "arr": arr, 
-                            "rotated": state["rotated"], 
-                            "place_on_board_at": [board_x, board_y]
-                        }
+                        move = board.make_move(orientation, [board_x, board_y])
                         if constants.VERBOSITY > 0:
                             print("Chosen move for RandomMovesBot (FAST): %s" % (move))
                         return move
@@ -85,44 +67,18 @@ def return_first_turn_move(gameboard, player):
     start_x, start_y = gameboard.start_points[player.number]
 
     for piece in pieces_keys:
-        piece_data = player.remaining_pieces[piece]
-        original_arr = piece_data["arr"]
-        
         for _ in range(20): 
-            flips = piece_data["flips"]
-            flip = random.choice(range(flips))
-            
-            rots = piece_data["rots"]
-            rot = random.choice(range(rots))
-
-            current_arr = np.rot90(original_arr, k=rot)
-            if flip == 1:
-                current_arr = np.flipud(current_arr)
-            
-            valid_anchors = []
-            for r in range(current_arr.shape[0]):
-                for c in range(current_arr.shape[1]):
-                    if current_arr[r][c] == 1:
-                        valid_anchors.append((r, c))
-            
-            if not valid_anchors:
-                continue
+            orientation = pieces.ORIENTATIONS[random.choice(pieces.PIECE_ORIENTATIONS[piece])]
 
-            anchor_r, anchor_c = random.choice(valid_anchors)
+            anchor_r, anchor_c = random.choice(orientation.cells)
             board_x = start_x - anchor_r
             board_y = start_y - anchor_c
 
             if (board_x >= 0 and board_y >= 0 and 
-                board_x + current_arr.shape[0] <= gameboard.rows and 
-                board_y + current_arr.shape[1] <= gameboard.cols):
+                board_x + orientation.shape[0] <= gameboard.rows and 
+                board_y + orientation.shape[1] <= gameboard.cols):
                 
-                move = {
-                    "piece": piece, 
-                    "arr": current_arr, 
-                    "rotated": rot, 
-                    "flipped": flip,
-                    "place_on_board_at": [board_x, board_y]
-                }
+                move = board.make_move(orientation, [board_x, board_y])
                 
                 if constants.VERBOSITY > 0:
                     print("Chosen first move for RandomMovesBot: %s" % (move))
@@ -1,8 +1,9 @@
 import numpy as np, pygame, os, json
 from enum import Enum
-import board, pieces, constants, player, drawElements
+import board, constants, player, drawElements
 from board import Board
 from AI import AIManager
+from AI.AIWorker import AIWorker
 from drawElements import Button
 from network import Network
 
@@ -78,6 +79,8 @@ class GameSession:
         self.back_button = Button(cx - btn_w//2, cy + 60, btn_w, btn_h, "Back to Menu", constants.PURPLE, constants.ACCENT, "back_to_menu")
         
         self.is_paused = False
+        # Background search processes of the AI players, by player number
+        self.ai_workers = {}
         self.pause_button = Button(constants.WINDOW_WIDTH - 70, 10, 60, 40, "||", constants.BOARD_GRID, constants.ACCENT, "toggle_pause")
 
         # Define pause panel buttons
@@ -111,9 +114,42 @@ class GameSession:
             players.append(new_p)
         return players
     
+    def get_ai_worker(self, ai_player):
+        worker = self.ai_workers.get(ai_player.number)
+        if worker is None:
+            worker = AIWorker(ai_player)
+            self.ai_workers[ai_player.number] = worker
+        return worker
+
+    def is_ai_thinking(self):
+        return any(worker.is_thinking() for worker in self.ai_workers.values())
+
+    def cancel_ai_search(self):
+        for worker in self.ai_workers.values():
+            worker.cancel()
+
+    def ponder_ai_players(self):
+        """While a human is to move, lets the AI players set to ponder search the position."""
+        if len(self.players) != 2:
+            return # The AIs' searches only model a single opponent
+        key = self.gameboard.zobrist
+        for p in self.players:
+            if p.is_ai and p is not self.active_player and AIWorker.is_supported(p):
+                worker = self.get_ai_worker(p)
+                if worker.can_ponder() and worker.ponder_key != key:
+                    worker.ponder(self.get_state_to_save(), key)
+
+    def close(self):
+        """Stops the AI worker processes when the session is left."""
+        for worker in self.ai_workers.values():
+            worker.stop()
+        self.ai_workers = {}
+
     def switch_turn(self):
         self.active_player_idx = (self.active_player_idx + 1) % len(self.players)
         self.active_player = self.players[self.active_player_idx]
+        # Keeps the board's side to move (part of its Zobrist hash) right across skipped turns
+        self.gameboard.set_side_to_move(self.active_player.number)
         opponent_idx = (self.active_player_idx + 1) % len(self.players)
         return self.players[opponent_idx]
     
@@ -271,6 +307,8 @@ class GameSession:
     
     def run(self):
         if self.is_paused:
+            # The search restarts from the same position after the pause
+            self.cancel_ai_search()
             mouse_pos = pygame.mouse.get_pos()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: 
@@ -352,10 +390,14 @@ class GameSession:
                     if pause_action == "toggle_pause":
                         self.is_paused = True
                         return GameState.GAMEPLAY # Pause immediately
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE and self.active_player.is_ai:
+                    return GameState.MAIN_MENU
             
-            # Re-queue events so event_handler_local can use them later
-            for event in events:
-                pygame.event.post(event)
+            # Re-queue events so event_handler_local can use them later.
+            # While the AI thinks nobody reads them, so they are dropped.
+            if not self.active_player.is_ai:
+                for event in events:
+                    pygame.event.post(event)
                 
             can_move = board.check_if_player_can_move(self.gameboard, self.active_player)
 
@@ -367,21 +409,37 @@ class GameSession:
                 self.switch_turn()
                 self.save_game_state()
             
-            elif self.active_player.is_ai:
+            elif self.active_player.is_ai and not AIWorker.is_supported(self.active_player):
+                # Other AIs answer quickly or cannot be sent to a worker process
                 self.draw()
                 pygame.time.wait(100)
                 opponent = self.players[(self.active_player_idx + 1) % len(self.players)]
                 AIManager.main(self.gameboard, self.active_player, opponent)
                 self.switch_turn()
                 self.save_game_state()  # Save after AI move
+
+            elif self.active_player.is_ai:
+                # The AI searches in its worker process; keep drawing frames
+                # until its move comes back
+                worker = self.get_ai_worker(self.active_player)
+                if not worker.is_thinking():
+                    worker.request_move(self.get_state_to_save())
+                done, best_move = worker.poll()
+                if done:
+                    opponent = self.players[(self.active_player_idx + 1) % len(self.players)]
+                    AIManager.play_move(self.gameboard, self.active_player, opponent, best_move)
+                    self.switch_turn()
+                    self.save_game_state()  # Save after AI move
             
             else:
+                self.ponder_ai_players()
                 new_state = self.event_handler_local()
                 if new_state: return new_state
         
         # Check if Game is Over
         if not self.game_over and board.is_game_over(self.gameboard, self.players):
             self.game_over = True
+            self.cancel_ai_search()
             winners = board.get_winners(self.players)
             
             if len(winners) == 1:
@@ -419,6 +477,9 @@ class GameSession:
              
         elif self.infobox_msg_time_start is not None: 
              drawElements.draw_infobox_msg(self.screen, self.infobox_msg)
+
+        elif self.is_ai_thinking():
+             drawElements.draw_infobox_msg(self.screen, "ai_turn")
             
         pygame.display.update()
 
@@ -457,6 +518,8 @@ class GameSession:
             
         self.active_player_idx = saved_state["active_player_idx"]
         self.active_player = self.players[self.active_player_idx]
+        self.gameboard.side_to_move = self.active_player.number
+        self.gameboard.recompute_zobrist(self.players)
         
         # Re-calculate corners for all players
         all_players = self.players
@@ -500,6 +563,8 @@ class GameManager:
                 self.game_state = self.room_lobby_loop()
             elif self.game_state == GameState.GAMEPLAY:
                 self.game_state = self.game_session.run()
+                if self.game_state != GameState.GAMEPLAY:
+                    self.game_session.close()
             self.clock.tick(60)
         pygame.quit()
     
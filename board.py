@@ -1,8 +1,30 @@
-import numpy as np
+import numpy as np, random
 import constants, pieces
 
 empty = constants.BOARD_FILL_VALUE
 
+# Zobrist keys. They come from fixed seeds so every process (AI workers, other
+# network clients) hashes the same position to the same value.
+ZOBRIST_SEED = 0x5EED_B10C
+MAX_PLAYERS = 4
+
+def _zobrist_keys(seed, count):
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(count)]
+
+# Indexed by player number (index 0 is unused)
+ZOBRIST_SIDE = _zobrist_keys(ZOBRIST_SEED, MAX_PLAYERS + 1)
+ZOBRIST_PIECES = [_zobrist_keys(ZOBRIST_SEED + 100 + p_num, len(pieces.PIECE_TABLE)) for p_num in range(MAX_PLAYERS + 1)]
+_zobrist_cell_cache = {}
+
+def get_zobrist_cell_keys(cell_count):
+    """Returns keys[p_num][cell_index] for a board with cell_count cells."""
+    keys = _zobrist_cell_cache.get(cell_count)
+    if keys is None:
+        keys = [_zobrist_keys(ZOBRIST_SEED + 200 + p_num, cell_count) for p_num in range(MAX_PLAYERS + 1)]
+        _zobrist_cell_cache[cell_count] = keys
+    return keys
+
 class Board:
     def __init__(self, rows=constants.ROW_COUNT_2P, cols=constants.COLUMN_COUNT_2P, player_count=2):
         self.rows = rows
@@ -10,6 +32,126 @@ class Board:
         self.board = np.array([[constants.BOARD_FILL_VALUE for i in range(rows)] for j in range(cols)])
         self.turn_number = 1
         self.start_points = constants.get_start_points(rows, cols, player_count)
+        self.player_count = len(self.start_points)
+        self.side_to_move = 1
+        self.undo_stack = []
+        self.init_bitboards()
+
+    def init_bitboards(self):
+        """
+        Bitboards mirror self.board as Python ints, one bit per cell at
+        index x * cols + y. For every player we keep:
+          occupancy: cells covered by the player's pieces
+          forbidden: cells edge-adjacent to the player's pieces
+          anchors:   cells diagonal to the player's pieces (the start
+                     point before the first move)
+        """
+        self.full_mask = (1 << (self.rows * self.cols)) - 1
+        first_col = sum(1 << (x * self.cols) for x in range(self.rows))
+        last_col = first_col << (self.cols - 1)
+        self.not_first_col = self.full_mask & ~first_col
+        self.not_last_col = self.full_mask & ~last_col
+        # Mask of every catalog orientation placed at [0, 0], indexed by orientation id
+        self.orientation_masks = tuple(sum(1 << (i * self.cols + j) for i, j in o.cells) for o in pieces.ORIENTATIONS)
+        self.zobrist_cells = get_zobrist_cell_keys(self.rows * self.cols)
+        self.sync_bitboards()
+
+    def sync_bitboards(self):
+        """
+        Rebuilds every bitboard from self.board (e.g. after loading a saved game).
+        The Zobrist hash is rebuilt from the cells and side to move only; use
+        recompute_zobrist to include the players' remaining pieces as well.
+        """
+        self.occupancy = {p_num: 0 for p_num in self.start_points}
+        self.occupied = 0
+        self.zobrist = ZOBRIST_SIDE[self.side_to_move]
+        for x in range(self.rows):
+            for y in range(self.cols):
+                val = self.board[x][y]
+                if val != empty:
+                    bit = 1 << (x * self.cols + y)
+                    self.occupied |= bit
+                    if val in self.occupancy:
+                        self.occupancy[val] |= bit
+                        self.zobrist ^= self.zobrist_cells[val][x * self.cols + y]
+        self.forbidden = {}
+        self.anchors = {}
+        for p_num in self.occupancy:
+            self.refresh_player_masks(p_num)
+
+    def refresh_player_masks(self, p_num):
+        occupancy = self.occupancy[p_num]
+        self.forbidden[p_num] = self.edge_neighbours(occupancy)
+        if occupancy:
+            self.anchors[p_num] = self.diagonal_neighbours(occupancy)
+        else:
+            start_x, start_y = self.start_points[p_num]
+            self.anchors[p_num] = 1 << (start_x * self.cols + start_y)
+
+    def recompute_zobrist(self, players_list):
+        """
+        Computes the 64-bit Zobrist hash of the position from scratch. It covers
+        cell ownership, the side to move and each player's remaining pieces, and
+        fit_piece/unfit_last_piece keep self.zobrist equal to it incrementally.
+        """
+        self.sync_bitboards()
+        for p in players_list:
+            for piece_name, index in pieces.PIECE_INDEX.items():
+                if piece_name not in p.remaining_pieces:
+                    self.zobrist ^= ZOBRIST_PIECES[p.number][index]
+        return self.zobrist
+
+    def get_child_zobrist(self, move, p_num):
+        """The Zobrist hash after player p_num plays move, without playing it."""
+        orientation_id, x, y = get_move_key(move)
+        orientation = pieces.ORIENTATIONS[orientation_id]
+        cell_keys = self.zobrist_cells[p_num]
+        key = self.zobrist ^ ZOBRIST_PIECES[p_num][pieces.PIECE_INDEX[orientation.piece]]
+        for i, j in orientation.cells:
+            key ^= cell_keys[(x + i) * self.cols + y + j]
+        return key ^ ZOBRIST_SIDE[self.side_to_move] ^ ZOBRIST_SIDE[self.next_player_number(p_num)]
+
+    def next_player_number(self, p_num):
+        return p_num % self.player_count + 1
+
+    def set_side_to_move(self, p_num):
+        self.zobrist ^= ZOBRIST_SIDE[self.side_to_move] ^ ZOBRIST_SIDE[p_num]
+        self.side_to_move = p_num
+
+    def edge_neighbours(self, mask):
+        cols = self.cols
+        return (((mask << 1) & self.not_first_col) | ((mask >> 1) & self.not_last_col)
+                | (mask << cols) | (mask >> cols)) & self.full_mask
+
+    def diagonal_neighbours(self, mask):
+        cols = self.cols
+        return (((mask << (cols + 1)) & self.not_first_col) | ((mask << (cols - 1)) & self.not_last_col)
+                | ((mask >> (cols - 1)) & self.not_first_col) | ((mask >> (cols + 1)) & self.not_last_col)) & self.full_mask
+
+    def get_piece_mask(self, piece_arr, coords):
+        """
+        Returns the bitmask of piece_arr placed with its top left cell at coords,
+        or None if any part of the piece would fall outside the board.
+        """
+        return self.get_orientation_mask(get_orientation(piece_arr).id, coords)
+
+    def get_orientation_mask(self, orientation_id, coords):
+        """Same as get_piece_mask for a catalog orientation, without touching the array."""
+        x, y = coords[0], coords[1]
+        shape = pieces.ORIENTATIONS[orientation_id].shape
+        if x < 0 or y < 0 or x + shape[0] > self.rows or y + shape[1] > self.cols:
+            return None
+        return self.orientation_masks[orientation_id] << (x * self.cols + y)
+
+    def place_mask(self, mask, p_num):
+        self.occupancy[p_num] |= mask
+        self.occupied |= mask
+        self.refresh_player_masks(p_num)
+
+    def remove_mask(self, mask, p_num):
+        self.occupancy[p_num] &= ~mask
+        self.occupied &= ~mask
+        self.refresh_player_masks(p_num)
     
     def fit_piece(self, piece_data, player, players_list=None):
         """
@@ -17,56 +159,38 @@ class Board:
         player: the player object placing the piece
         players_list: list of all players (to update their corners)
         """
-        piece_arr = piece_data["arr"]
+        piece_arr = np.asarray(piece_data["arr"])
         pos_coords = piece_data["place_on_board_at"]
-        
-        piece_x_rng = range(piece_arr.shape[0])
-        piece_y_rng = range(piece_arr.shape[1])
-        board_x_rng = range(pos_coords[0], self.rows)
-        board_y_rng = range(pos_coords[1], self.cols)
-        
-        # 1. HANDLE FIRST MOVE (Dynamic Start Points)
-        if player.is_1st_move:
-            # Get start point for this specific player number (1-4)
-            # This will now correctly be [0,0] for both P1 and P2 in a 2P game
-            target_pos = self.start_points[player.number]
-            
-            is_within_starting_pos = False
-            for i, x in zip(piece_x_rng, board_x_rng):
-                for j, y in zip(piece_y_rng, board_y_rng):
-                    if [x, y] == target_pos and piece_arr[i][j] == 1:
-                        is_within_starting_pos = True
-            
-            if is_within_starting_pos:
-                for i, x in zip(piece_x_rng, board_x_rng):
-                    for j, y in zip(piece_y_rng, board_y_rng):
-                        if piece_arr[i][j] == 1 and self.board[x][y] == empty:
-                            self.board[x][y] = player.number * piece_arr[i][j]
-            else:
-                if constants.VERBOSITY > 0:
-                    print(f"Piece placed at {pos_coords} didn't cover start point {target_pos}")
-                return False    
-            player.is_1st_move = False
 
-        # 2. HANDLE REGULAR MOVES
-        else:
-            if self.check_is_move_valid(piece_arr, player, pos_coords):
-                for i, x in zip(piece_x_rng, board_x_rng):
-                    for j, y in zip(piece_y_rng, board_y_rng):
-                        if piece_arr[i][j] == 1:
-                            self.board[x][y] = player.number * piece_arr[i][j]
-            else:
-                if constants.VERBOSITY > 0:
+        # The start point is the only anchor a player has before their first
+        # move, so the same bitboard check covers both cases.
+        if not self.check_is_move_valid(piece_arr, player, pos_coords):
+            if constants.VERBOSITY > 0:
+                if player.is_1st_move:
+                    print(f"Piece placed at {pos_coords} didn't cover start point {self.start_points[player.number]}")
+                else:
                     print("Invalid move attempted in fit_piece")
-                return False
+            return False
+
+        p_num = player.number
+        cell_keys = self.zobrist_cells[p_num]
+        for i, j in get_piece_cells(piece_arr):
+            x, y = pos_coords[0] + i, pos_coords[1] + j
+            self.board[x][y] = p_num
+            self.zobrist ^= cell_keys[x * self.cols + y]
+        self.place_mask(self.get_piece_mask(piece_arr, pos_coords), p_num)
+        player.is_1st_move = False
 
         piece_name = piece_data.get("piece_name")
         if not piece_name:
             piece_name = piece_data.get("piece")
+        self.zobrist ^= ZOBRIST_PIECES[p_num][pieces.PIECE_INDEX[piece_name]]
 
         piece_info = {"piece": piece_name, 
                       "arr": piece_arr, 
-                      "place_on_board_at": pos_coords}
+                      "place_on_board_at": pos_coords,
+                      "side_to_move": self.side_to_move}
+        self.set_side_to_move(self.next_player_number(p_num))
         
         player.discard_piece(piece_info)
         player.empty_current_piece()
@@ -75,48 +199,77 @@ class Board:
         player.update_score()
         
         target_players = players_list if players_list else [player]
-        self.optimised_update_board_corners(piece_info, target_players)
+        piece_info["corner_delta"] = self.optimised_update_board_corners(piece_info, target_players)
         
         return True
     
     def unfit_last_piece(self, player, players_list):
         piece = player.retrieve_last_piece()
+        pos_coords = piece["place_on_board_at"]
 
-        piece_x_rng = range(piece["arr"].shape[0])
-        piece_y_rng = range(piece["arr"].shape[1])
-        board_x_rng = range(piece["place_on_board_at"][0], self.rows)
-        board_y_rng = range(piece["place_on_board_at"][1], self.cols)
-
-        for i, x in zip(piece_x_rng, board_x_rng):
-            for j, y in zip(piece_y_rng, board_y_rng):
-                if piece["arr"][i][j] == 1:
-                    self.board[x][y] = empty
+        p_num = player.number
+        cell_keys = self.zobrist_cells[p_num]
+        for i, j in get_piece_cells(piece["arr"]):
+            x, y = pos_coords[0] + i, pos_coords[1] + j
+            self.board[x][y] = empty
+            self.zobrist ^= cell_keys[x * self.cols + y]
+        self.remove_mask(self.get_piece_mask(piece["arr"], pos_coords), p_num)
+        self.zobrist ^= ZOBRIST_PIECES[p_num][pieces.PIECE_INDEX[piece["piece"]]]
+        self.set_side_to_move(piece.get("side_to_move", p_num))
         
         self.turn_number -= 1
         player.turn_number -= 1
         player.update_score()
         
-        self.update_board_corners(players_list)
-    
+        if "corner_delta" in piece:
+            self.revert_board_corners(piece["corner_delta"])
+        else:
+            self.update_board_corners(players_list)
+
+    def apply_move(self, move, player, players_list):
+        """
+        Plays move in place and records what is needed to take it back with
+        undo_move. Searches use this pair instead of copying the board and players.
+        Returns False (and records nothing) if the move is not valid.
+        """
+        is_1st_move = player.is_1st_move
+        current_piece = player.current_piece
+        if not self.fit_piece(move, player, players_list):
+            return False
+        self.undo_stack.append((player, players_list, is_1st_move, current_piece))
+        return True
+
+    def undo_move(self):
+        """Takes back the last move played with apply_move."""
+        player, players_list, is_1st_move, current_piece = self.undo_stack.pop()
+        self.unfit_last_piece(player, players_list)
+        player.is_1st_move = is_1st_move
+        player.current_piece = current_piece
+
     def update_board_corners(self, players_list):
         """Full scan update for all players in list."""
         for p in players_list:
-            p.board_corners = {"bl":[],"br":[],"tl":[],"tr":[]}
+            p.board_corners = {"bl":set(),"br":set(),"tl":set(),"tr":set()}
             for x in range(self.rows):
                 for y in range(self.cols):
                     if self.board[x][y] == p.number:
                         tl, tr, bl, br = self.check_surrounding_piece_coords(x, y, p.number)
                         if tl and x-1 >= 0 and y-1 >= 0:
-                            p.board_corners["tl"].append([x-1, y-1])
+                            p.board_corners["tl"].add((x-1, y-1))
                         if bl and x+1 < self.rows and y-1 >= 0:
-                            p.board_corners["bl"].append([x+1, y-1])
+                            p.board_corners["bl"].add((x+1, y-1))
                         if tr and x-1 >= 0 and y+1 < self.cols:
-                            p.board_corners["tr"].append([x-1, y+1])
+                            p.board_corners["tr"].add((x-1, y+1))
                         if br and x+1 < self.rows and y+1 < self.cols:
-                            p.board_corners["br"].append([x+1,y+1])
+                            p.board_corners["br"].add((x+1, y+1))
     
     def optimised_update_board_corners(self, piece_played, players_list):
-        """Updates corners relative to the specific piece placed."""
+        """
+        Updates corners relative to the specific piece placed.
+        Returns the changes made as (player, direction, coord, added) tuples so
+        that revert_board_corners can undo them without a rescan.
+        """
+        corner_delta = []
         b_x_low, b_y_low = piece_played["place_on_board_at"][0], piece_played["place_on_board_at"][1]
         b_x_high = b_x_low + piece_played["arr"].shape[0]
         b_y_high = b_y_low + piece_played["arr"].shape[1]
@@ -132,20 +285,39 @@ class Board:
                     if self.board[x][y] == p.number:
                         tl, tr, bl, br = self.check_surrounding_piece_coords(x, y, p.number)
                         
-                        def update_corner(condition, c_list, coord):
+                        def update_corner(condition, direction, coord):
+                            c_set = p.board_corners[direction]
                             if condition:
-                                if coord not in c_list: c_list.append(coord)
+                                if coord not in c_set:
+                                    c_set.add(coord)
+                                    corner_delta.append((p, direction, coord, True))
                             else:
-                                if coord in c_list: c_list.remove(coord)
+                                if coord in c_set:
+                                    c_set.remove(coord)
+                                    corner_delta.append((p, direction, coord, False))
 
                         if x-1 >= 0 and y-1 >= 0:
-                            update_corner(tl, p.board_corners["tl"], [x-1, y-1])
+                            update_corner(tl, "tl", (x-1, y-1))
                         if x+1 < self.rows and y-1 >= 0:
-                            update_corner(bl, p.board_corners["bl"], [x+1, y-1])
+                            update_corner(bl, "bl", (x+1, y-1))
                         if x-1 >= 0 and y+1 < self.cols:
-                            update_corner(tr, p.board_corners["tr"], [x-1, y+1])
+                            update_corner(tr, "tr", (x-1, y+1))
                         if x+1 < self.rows and y+1 < self.cols:
-                            update_corner(br, p.board_corners["br"], [x+1, y+1])
+                            update_corner(br, "br", (x+1, y+1))
+        return corner_delta
+
+    def revert_board_corners(self, corner_delta):
+        """
+        Undoes the corner changes recorded by optimised_update_board_corners.
+        Only corners in the neighbourhood of that piece were touched, so
+        replaying the delta backwards restores the previous corner sets exactly,
+        provided moves are taken back in the reverse order they were played.
+        """
+        for p, direction, coord, added in reversed(corner_delta):
+            if added:
+                p.board_corners[direction].remove(coord)
+            else:
+                p.board_corners[direction].add(coord)
     
     def check_surrounding_piece_coords(self, x, y, p_num):
         tl, tr, bl, br = True, True, True, True
@@ -178,107 +350,158 @@ class Board:
         return tl, tr, bl, br
     
     def check_is_move_valid(self, piece_arr, player, coords):
-        is_there_a_pc_on_the_side = False
-        is_corner_exists = False
-        
-        piece_x_rng = range(piece_arr.shape[0])
-        piece_y_rng = range(piece_arr.shape[1])
-        board_x_rng = range(coords[0], self.rows)
-        board_y_rng = range(coords[1], self.cols)
-        
-        if piece_arr.shape[0] + coords[0] > self.rows\
-           or piece_arr.shape[1] + coords[1] > self.cols:
-           return False
-
-        for i, x in zip(piece_x_rng, board_x_rng):
-            for j, y in zip(piece_y_rng, board_y_rng):
-                if piece_arr[i][j] == 1 and self.board[x][y] == empty:
-                    tl, tr, bl, br = get_corners_of_piece(piece_arr, i, j)
-                    for p, b in zip([tl,tr,bl,br],["br","bl","tr","tl"]):
-                        if p:
-                            if [x, y] in player.board_corners[b]:
-                                is_corner_exists = True
-                    for a, b in zip([x, x, x-1, x+1], [y-1, y+1, y, y]):
-                        if a < 0 or b < 0 or a >= self.rows or b >= self.cols:
-                            pass
-                        else:
-                            if self.board[a][b] == player.number:
-                                is_there_a_pc_on_the_side = True
-                elif piece_arr[i][j] == 1 and self.board[x][y] != empty:
-                    return False
-        if is_corner_exists and not is_there_a_pc_on_the_side:
-            return True
-        return False
+        """
+        A move is valid when the piece stays on the board, covers no occupied cell,
+        touches none of the player's pieces along an edge and covers one of the
+        player's anchors (diagonal corners, or the start point on the first move).
+        """
+        return self.check_is_mask_valid(self.get_piece_mask(piece_arr, coords), player)
+
+    def check_is_orientation_valid(self, orientation_id, player, coords):
+        return self.check_is_mask_valid(self.get_orientation_mask(orientation_id, coords), player)
+
+    def check_is_mask_valid(self, mask, player):
+        if mask is None:
+            return False
+        p_num = player.number
+        if mask & (self.occupied | self.forbidden[p_num]):
+            return False
+        return bool(mask & self.anchors[p_num])
     
+    def get_open_anchors(self, player):
+        """Anchor cells the player could still cover: empty and not edge-adjacent to their pieces."""
+        p_num = player.number
+        return self.anchors[p_num] & ~(self.occupied | self.forbidden[p_num])
+
+    def corners_gained(self, orientation_id, coords, player):
+        """Number of new open anchors the player would get by placing the orientation at coords."""
+        mask = self.get_orientation_mask(orientation_id, coords)
+        p_num = player.number
+        blocked = self.occupied | self.forbidden[p_num] | self.anchors[p_num] | mask | self.edge_neighbours(mask)
+        return bin(self.diagonal_neighbours(mask) & ~blocked).count("1")
+
+    def get_anchored_positions(self, orientation_id, player, open_anchors=None):
+        """
+        Returns the valid [x, y] positions of a catalog orientation, in row-major order.
+        Only placements that put one of the piece's cells on an open anchor can be
+        legal, so instead of trying every board cell we align each cell of the
+        orientation with each anchor and check the resulting placements once.
+        """
+        if open_anchors is None:
+            open_anchors = self.get_open_anchors(player)
+        blocked = self.occupied | self.forbidden[player.number]
+        cells = pieces.ORIENTATIONS[orientation_id].cells
+        checked = set()
+        positions = []
+        for anchor in iter_bits(open_anchors):
+            anchor_x, anchor_y = divmod(anchor, self.cols)
+            for i, j in cells:
+                pos = (anchor_x - i, anchor_y - j)
+                if pos in checked:
+                    continue
+                checked.add(pos)
+                mask = self.get_orientation_mask(orientation_id, pos)
+                if mask is not None and not mask & blocked:
+                    positions.append(pos)
+        positions.sort()
+        return [list(pos) for pos in positions]
+
     def validate_and_return_move_positions(self, piece_arr, player):
-        place_on_board_at = []
-        for x in range(self.rows):
-            for y in range(self.cols):
-                if self.board[x][y] == empty:
-                    if self.check_is_move_valid(piece_arr, player, [x,y]):
-                        place_on_board_at.append([x,y])
-        return place_on_board_at
-
-def get_corners_of_piece(piece_arr, i, j):
-    tl, tr, bl, br = True, True, True, True
-    x_lim, y_lim = piece_arr.shape[0], piece_arr.shape[1]
-    try:
-        if i+1 < x_lim and piece_arr[i+1][j] == 1: bl, br = False, False
-    except IndexError: pass
-    try:
-        if i+1 < x_lim and j+1 < y_lim and piece_arr[i+1][j+1] == 1: br = False
-    except IndexError: pass
-    try:
-        if j+1 < y_lim and piece_arr[i][j+1] == 1: tr, br = False, False
-    except IndexError: pass
-    try:
-        if i-1 >= 0 and j+1 < y_lim and piece_arr[i-1][j+1] == 1: tr = False
-    except IndexError: pass
-    try:
-        if i-1 >= 0 and piece_arr[i-1][j] == 1: tl, tr = False, False
-    except IndexError: pass
-    try:
-        if i-1 >= 0 and j-1 >=0 and piece_arr[i-1][j-1] == 1: tl = False
-    except IndexError: pass
-    try:
-        if j-1 >=0 and piece_arr[i][j-1] == 1: tl, bl = False, False
-    except IndexError: pass
-    try:
-        if i+1 < x_lim and j-1 >=0 and piece_arr[i+1][j-1] == 1: bl = False
-    except IndexError: pass
-    return tl, tr, bl, br
+        return self.get_anchored_positions(get_orientation(piece_arr).id, player)
+
+def iter_bits(mask):
+    """Yields the indices of the set bits of mask, lowest first."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+def get_orientation(piece_arr):
+    """
+    Returns the catalog Orientation of a piece array. Every array in play
+    is a rotation or flip of a piece, so all of them are in the catalog.
+    """
+    orientation = pieces.find_orientation(piece_arr)
+    assert orientation is not None, "piece array is not in the orientation catalog"
+    return orientation
+
+def get_piece_cells(piece_arr):
+    """Returns the (i, j) offsets of the filled cells of a piece array."""
+    return get_orientation(piece_arr).cells
 
 def return_all_pending_moves(gameboard, player, mode = "ai"):
     pending_moves_list = []
 
+    open_anchors = None
+    if not player.is_1st_move:
+        # Only placements covering one of the player's corners can be legal
+        open_anchors = gameboard.get_open_anchors(player)
+        if not open_anchors:
+            return pending_moves_list
+    for piece_name in player.remaining_pieces.keys():
+        pending_moves_list.extend(return_piece_moves(gameboard, player, piece_name, open_anchors))
+        if mode == "is_game_over" and len(pending_moves_list) > 0:
+            return pending_moves_list
+    return pending_moves_list
+
+def return_piece_moves(gameboard, player, piece_name, open_anchors = None):
+    """
+    All legal placements of one piece, in every orientation. Lets callers
+    enumerate a player's moves a piece at a time; open_anchors can be passed
+    in when several pieces are generated for the same position.
+    """
+    piece_moves = []
+
     if player.is_1st_move:
         # This will now correctly be [0,0] for both P1 and P2 in a 2P game
         start_x, start_y = gameboard.start_points[player.number]
         
-        for current_piece in pieces.get_all_piece_states(player):
-            for x in range(current_piece["arr"].shape[0]):
-                for y in range(current_piece["arr"].shape[1]):
-                    if current_piece["arr"][x][y] == 1:
-                        board_x = start_x - x
-                        board_y = start_y - y
-                        
-                        # --- Add boundary check to prevent crashes ---
-                        if (board_x >= 0 and board_y >= 0 and 
-                            board_x + current_piece["arr"].shape[0] <= gameboard.rows and 
-                            board_y + current_piece["arr"].shape[1] <= gameboard.cols):
-                        
-                            pending_moves_list.append({"piece": current_piece["piece"], \
-                                "flipped": current_piece["flipped"], "arr": current_piece["arr"], \
-                                "rotated": current_piece["rotated"], "place_on_board_at": [board_x, board_y]})
+        for orientation_id in pieces.PIECE_ORIENTATIONS[piece_name]:
+            orientation = pieces.ORIENTATIONS[orientation_id]
+            for x, y in orientation.cells:
+                board_x = start_x - x
+                board_y = start_y - y
+                
+                # --- Add boundary check to prevent crashes ---
+                if (board_x >= 0 and board_y >= 0 and 
+                    board_x + orientation.shape[0] <= gameboard.rows and 
+                    board_y + orientation.shape[1] <= gameboard.cols):
+                
+                    piece_moves.append(make_move(orientation, [board_x, board_y]))
     else:
-        for current_piece in pieces.get_all_piece_states(player):
-            board_positions = gameboard.validate_and_return_move_positions(current_piece["arr"], player)
-            for pos in board_positions:
-                pending_moves_list.append({"piece": current_piece["piece"], "flipped": current_piece["flipped"],\
-                            "arr": current_piece["arr"], "rotated": current_piece["rotated"], "place_on_board_at": pos})
-                if mode == "is_game_over" and len(pending_moves_list) > 0:
-                    return pending_moves_list
-    return pending_moves_list
+        if open_anchors is None:
+            open_anchors = gameboard.get_open_anchors(player)
+        if not open_anchors:
+            return piece_moves
+        for orientation_id in pieces.PIECE_ORIENTATIONS[piece_name]:
+            orientation = pieces.ORIENTATIONS[orientation_id]
+            for pos in gameboard.get_anchored_positions(orientation_id, player, open_anchors):
+                piece_moves.append(make_move(orientation, pos))
+    return piece_moves
+
+def make_move(orientation, pos):
+    """Builds the move dict used throughout the game for a catalog orientation placed at pos."""
+    return {"piece": orientation.piece, "flipped": orientation.flipped, "arr": orientation.arr,
+            "rotated": orientation.rotated, "orientation": orientation.id, "place_on_board_at": pos}
+
+def get_move_key(move):
+    """Compact, hashable identity of a move: (orientation id, x, y)."""
+    orientation_id = move.get("orientation")
+    if orientation_id is None:
+        orientation_id = get_orientation(move["arr"]).id
+    pos = move["place_on_board_at"]
+    return orientation_id, pos[0], pos[1]
+
+def get_move_code(gameboard, move):
+    """Packs a move into a single int: orientation id and top-left cell on this board's grid."""
+    orientation_id, x, y = get_move_key(move)
+    return orientation_id * gameboard.rows * gameboard.cols + x * gameboard.cols + y
+
+def move_from_code(gameboard, move_code):
+    """Inverse of get_move_code, as a move dict."""
+    orientation_id, cell = divmod(move_code, gameboard.rows * gameboard.cols)
+    x, y = divmod(cell, gameboard.cols)
+    return make_move(pieces.ORIENTATIONS[orientation_id], [x, y])
 
 def check_if_player_can_move(gameboard, player):
     """
@@ -292,66 +515,30 @@ def check_if_player_can_move(gameboard, player):
         # Check if *any* piece can be placed on the start point
         start_x, start_y = gameboard.start_points[player.number]
         for piece_name in player.remaining_pieces.keys():
-            piece_data = player.remaining_pieces[piece_name]
-            # Use the helper function from pieces.py
-            orientations = pieces.get_all_piece_states_for_one_piece(piece_name, piece_data)
-            for state in orientations:
-                arr = state["arr"]
-                for x in range(arr.shape[0]):
-                    for y in range(arr.shape[1]):
-                        if arr[x][y] == 1:
-                            board_x, board_y = start_x - x, start_y - y
-                            # Check if it fits within bounds
-                            if (board_x >= 0 and board_y >= 0 and 
-                                board_x + arr.shape[0] <= gameboard.rows and 
-                                board_y + arr.shape[1] <= gameboard.cols):
-                                # This move is *possible*.
-                                return True
+            for orientation_id in pieces.PIECE_ORIENTATIONS[piece_name]:
+                orientation = pieces.ORIENTATIONS[orientation_id]
+                for x, y in orientation.cells:
+                    board_x, board_y = start_x - x, start_y - y
+                    # Check if it fits within bounds
+                    if (board_x >= 0 and board_y >= 0 and 
+                        board_x + orientation.shape[0] <= gameboard.rows and 
+                        board_y + orientation.shape[1] <= gameboard.cols):
+                        # This move is *possible*.
+                        return True
         return False # No piece could be placed on start
     
     else:
-        # This is the main performance hog.
         # Get all possible corners the player can play on.
-        all_corners = []
-        for corner_list in player.board_corners.values():
-            all_corners.extend(corner_list)
-        
-        if not all_corners:
+        open_anchors = gameboard.get_open_anchors(player)
+        if not open_anchors:
             return False # No corners, no moves.
 
-        # Now, for each remaining piece...
+        # Now, for each remaining piece and each of its orientations...
         for piece_name in player.remaining_pieces.keys():
-            piece_data = player.remaining_pieces[piece_name]
-            orientations = pieces.get_all_piece_states_for_one_piece(piece_name, piece_data)
-            
-            # ...and each orientation...
-            for state in orientations:
-                arr = state["arr"]
-                # ...find all the blocks in that piece...
-                piece_blocks = []
-                for r in range(arr.shape[0]):
-                    for c in range(arr.shape[1]):
-                        if arr[r][c] == 1:
-                            piece_blocks.append((r, c))
-                
-                if not piece_blocks: continue
-
-                # ...and for each corner, try to place each block on it.
-                # Use a set to avoid re-checking the same placement
-                checked_placements = set() 
-                for corner_x, corner_y in all_corners:
-                    for anchor_r, anchor_c in piece_blocks:
-                        board_x = corner_x - anchor_r
-                        board_y = corner_y - anchor_c
-                        
-                        placement_key = (board_x, board_y, state["rotated"], state["flipped"])
-                        if placement_key in checked_placements:
-                            continue
-                        checked_placements.add(placement_key)
-
-                        # Now check if this placement is valid
-                        if gameboard.check_is_move_valid(arr, player, [board_x, board_y]):
-                            return True # Found one!
+            for orientation_id in pieces.PIECE_ORIENTATIONS[piece_name]:
+                # ...try to place each block on each corner
+                if gameboard.get_anchored_positions(orientation_id, player, open_anchors):
+                    return True # Found one!
         
         return False
 
@@ -370,15 +557,15 @@ def is_game_over(board, players_list):
     return True
 
 def scoring_fn(remaining_pieces):
+    """
+    Score of a player with remaining_pieces left, given as the player's dict
+    or any collection of piece names: one point lost per unplaced cell.
+    """
     score = constants.STARTING_SCORE
     if len(remaining_pieces) == 0:
         score += 15
     else:
-        for _, val in remaining_pieces.items():
-            for i in range(val["arr"].shape[0]):
-                for j in range(val["arr"].shape[1]):
-                    if val["arr"][i][j] == 1:
-                        score -= 1
+        score -= sum(pieces.PIECE_SIZES[piece_name] for piece_name in remaining_pieces)
     if len(remaining_pieces) == 1 and "piece1" in remaining_pieces \
        and score == 88:
         score += 5
@@ -85,7 +85,7 @@ AI_PARAMS = {"randombot_p2" : {"is_ai" : True, "color" : ORANGE, "name_if_ai" :
              "rlkeras_p2" : {"is_ai" : True, "color" : ORANGE, "name_if_ai" : "ReinforcementLearningAI", "ai_class": get_model("tf_keras")},
              "rltorch_p2" : {"is_ai" : True, "color" : ORANGE, "name_if_ai" : "ReinforcementLearningAI", "ai_class": get_model("torch")},
              "alphabeta_easy_p2": {"is_ai": True, "color": ORANGE, "name_if_ai": "MinimaxAI", "ai_class": Minimax(ORANGE, 2, depth=1)},
-             "alphabeta_hard_p2": {"is_ai": True, "color": ORANGE, "name_if_ai": "MinimaxAI", "ai_class": Minimax(ORANGE, 2, depth=2)},
+             "alphabeta_hard_p2": {"is_ai": True, "color": ORANGE, "name_if_ai": "MinimaxAI", "ai_class": Minimax(ORANGE, 2, depth=4, time_limit=1.5, ponder=True, use_book=True)},
              "mcts_easy_p2": {"is_ai": True, "color": ORANGE, "name_if_ai": "MCTS_AI", "ai_class": MCTS(ORANGE, 2, iterations=5)},
-             "mcts_hard_p2": {"is_ai": True, "color": ORANGE, "name_if_ai": "MCTS_AI", "ai_class": MCTS(ORANGE, 2, iterations=10)}
+             "mcts_hard_p2": {"is_ai": True, "color": ORANGE, "name_if_ai": "MCTS_AI", "ai_class": MCTS(ORANGE, 2, time_limit=1.5, ponder=True, use_book=True)}
             }
\ No newline at end of file
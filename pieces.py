@@ -1,82 +1,105 @@
 import numpy as np
+from collections import namedtuple
+
+PIECE_TABLE = {
+    "piece1": {"arr": [[1]], "rots": 1, "flips": 1},
+    "piece2": {"arr": [[1],[1]], "rots": 2, "flips": 1},
+    "piece3": {"arr": [[1],[1],[1]], "rots": 2, "flips": 1},
+    "piece4": {"arr": [[1,0],[1,1]], "rots": 4, "flips": 1},
+    "piece5": {"arr": [[1],[1],[1],[1]], "rots": 2, "flips": 1},
+    "piece6": {"arr": [[0,1],[0,1],[1,1]], "rots": 4, "flips": 2},
+    "piece7": {"arr": [[1,0],[1,1],[1,0]], "rots": 4, "flips": 1},
+    "piece8": {"arr": [[1,1],[1,1]], "rots": 1, "flips": 1},
+    "piece9": {"arr": [[1,1,0],[0,1,1]], "rots": 2, "flips": 2},
+    "piece10": {"arr": [[1],[1],[1],[1],[1]], "rots": 2, "flips": 1},
+    "piece11": {"arr": [[0,1],[0,1],[0,1],[1,1]], "rots": 4, "flips": 2},
+    "piece12": {"arr": [[0,1],[0,1],[1,1],[1,0]], "rots": 4, "flips": 2},
+    "piece13": {"arr": [[0,1],[1,1],[1,1]], "rots": 4, "flips": 2},
+    "piece14": {"arr": [[1,1],[0,1],[1,1]], "rots": 4, "flips": 1},
+    "piece15": {"arr": [[1,0],[1,1],[1,0],[1,0]], "rots": 4, "flips": 2},
+    "piece16": {"arr": [[0,1,0],[0,1,0],[1,1,1]], "rots": 4, "flips": 1},
+    "piece17": {"arr": [[1,0,0],[1,0,0],[1,1,1]], "rots": 4, "flips": 1},
+    "piece18": {"arr": [[1,1,0],[0,1,1],[0,0,1]], "rots": 4, "flips": 1},
+    "piece19": {"arr": [[1,0,0],[1,1,1],[0,0,1]], "rots": 2, "flips": 2},
+    "piece20": {"arr": [[1,0,0],[1,1,1],[0,1,0]], "rots": 4, "flips": 2},
+    "piece21": {"arr": [[0,1,0],[1,1,1],[0,1,0]], "rots": 1, "flips": 1},
+}
+
+# One entry per distinct placement shape of a piece; cells are the (i, j)
+# offsets of the filled cells. The cells a placement forbids or opens as
+# anchors come from shifting its bitmask (Board.edge_neighbours,
+# Board.diagonal_neighbours), so they are not stored here.
+Orientation = namedtuple("Orientation", ["id", "piece", "flipped", "rotated", "arr", "cells", "shape"])
+
+def _read_only(arr):
+    arr = np.array(arr)
+    arr.setflags(write=False)
+    return arr
+
+def _orientation_key(arr):
+    arr = np.asarray(arr)
+    return arr.shape, np.asarray(arr, dtype=np.int8).tobytes()
+
+def _build_catalog():
+    orientations = []
+    by_piece = {}
+    by_key = {}
+    for piece, data in PIECE_TABLE.items():
+        base = np.array(data["arr"])
+        by_piece[piece] = []
+        for flip in range(2):
+            flipped = np.flipud(base) if flip else base
+            for rot in range(4):
+                arr = np.rot90(flipped, k=rot)
+                key = _orientation_key(arr)
+                # Symmetric pieces repeat shapes, keep the first occurrence only
+                if key in by_key:
+                    continue
+                cells = tuple((int(i), int(j)) for i, j in zip(*np.nonzero(arr)))
+                orientation = Orientation(len(orientations), piece, flip, rot, _read_only(arr), cells, arr.shape)
+                orientations.append(orientation)
+                by_piece[piece].append(orientation.id)
+                by_key[key] = orientation.id
+        by_piece[piece] = tuple(by_piece[piece])
+    return tuple(orientations), by_piece, by_key
+
+# Built once at import, shared by every move generator
+ORIENTATIONS, PIECE_ORIENTATIONS, ORIENTATION_INDEX = _build_catalog()
+PIECE_ARRAYS = {piece: _read_only(data["arr"]) for piece, data in PIECE_TABLE.items()}
+PIECE_SIZES = {piece: len(ORIENTATIONS[ids[0]].cells) for piece, ids in PIECE_ORIENTATIONS.items()}
+PIECE_INDEX = {piece: index for index, piece in enumerate(PIECE_TABLE)}
+
+def get_piece(piece_name):
+    data = PIECE_TABLE[piece_name]
+    return {"arr": PIECE_ARRAYS[piece_name], "rots": data["rots"], "flips": data["flips"], "rects": []}
 
 def get_pieces():
-    dict_pieces={
-        "piece1": {"arr":np.array([[1]]),"rots":1,"flips":1,"rects":[]},
-        "piece2": {"arr":np.array([[1],[1]]),"rots":2,"flips":1,"rects":[]},
-        "piece3": {"arr":np.array([[1],[1],[1]]),"rots":2,"flips":1,"rects":[]},
-        "piece4": {"arr":np.array([[1,0],[1,1]]),"rots":4,"flips":1,"rects":[]},
-        "piece5": {"arr":np.array([[1],[1],[1],[1]]),"rots":2,"flips":1,"rects":[]},
-        "piece6": {"arr":np.array([[0,1],[0,1],[1,1]]),"rots":4,"flips":2,"rects":[]},
-        "piece7": {"arr":np.array([[1,0],[1,1],[1,0]]),"rots":4,"flips":1,"rects":[]},
-        "piece8": {"arr":np.array([[1,1],[1,1]]),"rots":1,"flips":1,"rects":[]},
-        "piece9": {"arr":np.array([[1,1,0],[0,1,1]]),"rots":2,"flips":2,"rects":[]},
-        "piece10": {"arr":np.array([[1],[1],[1],[1],[1]]),"rots":2,"flips":1,"rects":[]},
-        "piece11": {"arr":np.array([[0,1],[0,1],[0,1],[1,1]]),"rots":4,"flips":2,"rects":[]},
-        "piece12": {"arr":np.array([[0,1],[0,1],[1,1],[1,0]]),"rots":4,"flips":2,"rects":[]},
-        "piece13": {"arr":np.array([[0,1],[1,1],[1,1]]),"rots":4,"flips":2,"rects":[]},
-        "piece14": {"arr":np.array([[1,1],[0,1],[1,1]]),"rots":4,"flips":1,"rects":[]},
-        "piece15": {"arr":np.array([[1,0],[1,1],[1,0],[1,0]]),"rots":4,"flips":2,"rects":[]},
-        "piece16": {"arr":np.array([[0,1,0],[0,1,0],[1,1,1]]),"rots":4,"flips":1,"rects":[]},
-        "piece17": {"arr":np.array([[1,0,0],[1,0,0],[1,1,1]]),"rots":4,"flips":1,"rects":[]},
-        "piece18": {"arr":np.array([[1,1,0],[0,1,1],[0,0,1]]),"rots":4,"flips":1,"rects":[]},
-        "piece19": {"arr":np.array([[1,0,0],[1,1,1],[0,0,1]]),"rots":2,"flips":2,"rects":[]},
-        "piece20": {"arr":np.array([[1,0,0],[1,1,1],[0,1,0]]),"rots":4,"flips":2,"rects":[]},
-        "piece21": {"arr":np.array([[0,1,0],[1,1,1],[0,1,0]]),"rots":1,"flips":1,"rects":[]},
-    }
-    return dict_pieces
+    return {piece: get_piece(piece) for piece in PIECE_TABLE}
+
+def find_orientation(piece_arr):
+    """Returns the catalog Orientation matching a piece array, or None."""
+    orientation_id = ORIENTATION_INDEX.get(_orientation_key(piece_arr))
+    if orientation_id is None:
+        return None
+    return ORIENTATIONS[orientation_id]
 
 def get_all_piece_states(player = None):
-    list_pieces = []
     if player is None:
-        pieces = get_pieces()
+        piece_names = PIECE_TABLE.keys()
     else:
-        pieces = player.remaining_pieces
-    for piece in pieces.keys():
-        current_piece = pieces[piece]["arr"]
-        for flip in range(pieces[piece]["flips"]):
-            if not flip == 0:
-                current_piece = np.flipud(current_piece)
-            for rot in range(pieces[piece]["rots"]):
-                if not rot == 0:
-                    current_piece = np.rot90(current_piece, k = 1)
-                list_pieces.append({"piece": piece, "arr": current_piece, "flipped": flip, "rotated": rot})
+        piece_names = player.remaining_pieces.keys()
+    list_pieces = []
+    for piece in piece_names:
+        list_pieces.extend(get_all_piece_states_for_one_piece(piece))
     return list_pieces
 
-def get_all_piece_states_for_one_piece(piece_name, piece_data):
+def get_all_piece_states_for_one_piece(piece_name, piece_data = None):
     """
     Returns all orientation arrays for a single piece.
     """
-    list_orientations = []
-    
-    original_arr = np.array(piece_data["arr"])
-    
-    current_piece = np.array(original_arr)
-    
-    for flip in range(piece_data["flips"]):
-        if flip == 1:
-            current_piece = np.flipud(original_arr)
-        else:
-            current_piece = np.array(original_arr)
-            
-        for rot in range(piece_data["rots"]):
-            if rot == 0:
-                current_piece_rotated = np.array(current_piece)
-            else:
-                # Rotate the *current* flip state
-                current_piece_rotated = np.rot90(current_piece_rotated, k=1)
-            
-            list_orientations.append({
-                "piece": piece_name, 
-                "arr": current_piece_rotated, 
-                "flipped": flip, 
-                "rotated": rot
-            })
-            
-    return list_orientations
+    return [{"piece": piece_name, "arr": ORIENTATIONS[o_id].arr, "flipped": ORIENTATIONS[o_id].flipped,
+             "rotated": ORIENTATIONS[o_id].rotated, "orientation": o_id}
+            for o_id in PIECE_ORIENTATIONS[piece_name]]
 
 def get_piece_size(piece_name):
-    all_pieces = get_pieces()
-    if piece_name in all_pieces:
-        return int(np.sum(all_pieces[piece_name]["arr"]))
-    return 0
\ No newline at end of file
+    return PIECE_SIZES.get(piece_name, 0)
@@ -10,7 +10,8 @@ class Player:
         self.color = color
         self.score = board.scoring_fn(self.remaining_pieces)
         self.turn_number = 1
-        self.board_corners = {"bl":[], "br":[], "tl":[], "tr":[]}
+        # Corner coordinates as (x, y) tuples, one set per direction
+        self.board_corners = {"bl":set(), "br":set(), "tl":set(), "tr":set()}
         self.is_1st_move = True
         self.is_ai = is_ai
         self.ai_name = ai_name
@@ -19,11 +20,15 @@ class Player:
     def update_score(self):
         self.score = board.scoring_fn(self.remaining_pieces)
     
+    def get_corner_coords(self):
+        """Read-only view of every corner coordinate the player can play on, across all directions."""
+        return frozenset().union(*self.board_corners.values())
+    
     def empty_current_piece(self):
         self.current_piece = {"piece": "", "arr": [], "rotated": 0, "flipped": 0, "rects": [], "place_on_board_at": []}
     
     def rotate_current_piece(self, clockwise = True):
-        max_rots = pieces.get_pieces()[self.current_piece["piece"]]["rots"]
+        max_rots = pieces.PIECE_TABLE[self.current_piece["piece"]]["rots"]
         current_state = self.current_piece["rotated"]
     
         if clockwise:
@@ -44,7 +49,7 @@ class Player:
             print("New piece array for %s is %s" % (self.current_piece["piece"], self.current_piece["arr"]))
 
     def flip_current_piece(self):
-        if not pieces.get_pieces()[self.current_piece["piece"]]["flips"] == 1:
+        if not pieces.PIECE_TABLE[self.current_piece["piece"]]["flips"] == 1:
             if self.current_piece["flipped"] == 1:
                 self.current_piece["flipped"] = 0
             else:
@@ -56,8 +61,15 @@ class Player:
         self.discarded_pieces.append(piece)
     
     def retrieve_last_piece(self):
-        piece = self.discarded_pieces[-1]
-        self.remaining_pieces[piece["piece"]] = pieces.get_pieces()[piece["piece"]]
+        piece = self.discarded_pieces.pop()
+        # Keep the original piece order so move generation order survives an undo
+        restored = {}
+        for piece_name in pieces.PIECE_TABLE:
+            if piece_name == piece["piece"]:
+                restored[piece_name] = pieces.get_piece(piece_name)
+            elif piece_name in self.remaining_pieces:
+                restored[piece_name] = self.remaining_pieces[piece_name]
+        self.remaining_pieces = restored
         return piece
 
     def get_state(self):
@@ -75,19 +87,13 @@ class Player:
         self.score = state["score"]
         self.is_1st_move = state["is_1st_move"]
         
-        all_pieces = pieces.get_pieces()
         self.remaining_pieces = {}
         for piece_name in state["remaining_pieces"]:
-            if piece_name in all_pieces:
-                self.remaining_pieces[piece_name] = {
-                    "arr": np.array(all_pieces[piece_name]["arr"]),
-                    "rots": all_pieces[piece_name]["rots"],
-                    "flips": all_pieces[piece_name]["flips"],
-                    "rects": []
-                }
+            if piece_name in pieces.PIECE_TABLE:
+                self.remaining_pieces[piece_name] = pieces.get_piece(piece_name)
         
         self.discarded_pieces = []
-        initial_piece_names = list(pieces.get_pieces().keys())
+        initial_piece_names = list(pieces.PIECE_TABLE.keys())
         for piece_name in initial_piece_names:
             if piece_name not in self.remaining_pieces:
                 self.discarded_pieces.append({"piece": piece_name})